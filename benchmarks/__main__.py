@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+
+from benchmarks import runner
+from benchmarks.server import LocalServer, SyntheticAPI
+from benchmarks.suite import Suite
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmarks pluct against a local synthetic API')
+    parser.add_argument('--fields', type=int, default=20,
+                        help='properties of each item (default: 20)')
+    parser.add_argument('--fanout', type=int, default=10,
+                        help='links of each item (default: 10)')
+    parser.add_argument('--items', type=int, default=100,
+                        help='items of the collection (default: 100)')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='timed calls of each benchmark (default: 200)')
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help='run only the named benchmarks')
+    parser.add_argument('--output', metavar='PATH',
+                        help='save the results as JSON')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare with results saved with --output')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    options = parse_args(sys.argv[1:] if args is None else args)
+    api = SyntheticAPI(
+        fields=options.fields, fanout=options.fanout, items=options.items)
+
+    results = []
+    with LocalServer(api):
+        for name, setup, run in Suite(api).benchmarks():
+            if options.only and name not in options.only:
+                continue
+            results.append(runner.measure(
+                name, setup, run, iterations=options.iterations))
+
+    baseline = runner.load(options.compare) if options.compare else None
+    print(runner.format_table(results, baseline))
+
+    if options.output:
+        runner.save(results, options.output)
+
+
+if __name__ == '__main__':
+    main()
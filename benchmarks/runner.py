@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import json
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+def measure(name, setup, run, iterations=200, warmup=10):
+    state = setup()
+    for _ in range(warmup):
+        run(state)
+
+    timings = []
+    gc.collect()
+    started = clock()
+    for _ in range(iterations):
+        call_started = clock()
+        run(state)
+        timings.append(clock() - call_started)
+    elapsed = clock() - started
+
+    result = {
+        'name': name,
+        'iterations': iterations,
+        'ops_per_second': iterations / elapsed,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p90_ms': percentile(timings, 90) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'max_ms': max(timings) * 1000,
+    }
+    result.update(measure_allocations(state, run, iterations))
+    return result
+
+
+def measure_allocations(state, run, iterations):
+    if tracemalloc is None:
+        return {}
+
+    # Allocations are measured apart, tracing slows every call down
+    iterations = max(1, iterations // 10)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+        for _ in range(iterations):
+            run(state)
+
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    allocated = 0
+    blocks = 0
+    for stat in after.compare_to(before, 'filename'):
+        if stat.size_diff > 0:
+            allocated += stat.size_diff
+            blocks += stat.count_diff
+    return {
+        'peak_kb': (peak - current) / 1024.0,
+        'retained_kb_per_op': allocated / 1024.0 / iterations,
+        'retained_blocks_per_op': blocks / float(iterations),
+    }
+
+
+COLUMNS = (
+    ('ops/s', 'ops_per_second', '{0:>10.1f}'),
+    ('p50 ms', 'p50_ms', '{0:>9.3f}'),
+    ('p90 ms', 'p90_ms', '{0:>9.3f}'),
+    ('p99 ms', 'p99_ms', '{0:>9.3f}'),
+    ('peak KB', 'peak_kb', '{0:>10.1f}'),
+    ('KB/op', 'retained_kb_per_op', '{0:>10.2f}'),
+)
+
+
+def format_table(results, baseline=None):
+    widths = [len(fmt.format(0)) for header, key, fmt in COLUMNS]
+    lines = ['{0:<24} '.format('benchmark') + ' '.join(
+        header.rjust(width)
+        for (header, key, fmt), width in zip(COLUMNS, widths))]
+
+    baseline = dict((result['name'], result) for result in baseline or ())
+    for result in results:
+        cells = []
+        for (header, key, fmt), width in zip(COLUMNS, widths):
+            value = result.get(key)
+            cells.append('-'.rjust(width) if value is None
+                         else fmt.format(value))
+        line = '{0:<24} '.format(result['name']) + ' '.join(cells)
+
+        previous = baseline.get(result['name'])
+        if previous is not None:
+            line += '  {0:+.1f}% p50, {1:+.1f}% ops/s'.format(
+                change(previous['p50_ms'], result['p50_ms']),
+                change(previous['ops_per_second'], result['ops_per_second']))
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def change(previous, current):
+    if not previous:
+        return 0.0
+    return (current - previous) / previous * 100
+
+
+def save(results, path):
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as baseline:
+        return json.load(baseline)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class SyntheticAPI(object):
+
+    def __init__(self, fields=20, fanout=10, items=100):
+        self.fields = fields
+        self.fanout = fanout
+        self.items = items
+        self.base_url = None
+
+    def url(self, path):
+        return self.base_url + path
+
+    def definitions(self):
+        return {
+            'address': {
+                'type': 'object',
+                'properties': {
+                    'line': {'type': 'string'},
+                    'zipcode': {'type': 'integer'},
+                },
+                'required': ['zipcode'],
+            },
+        }
+
+    def item_schema(self):
+        properties = {
+            'id': {'type': 'string'},
+            'address': {'$ref': self.url('/definitions#/address')},
+        }
+        for field in range(self.fields):
+            properties['field%d' % field] = {'type': 'string'}
+
+        links = [{'rel': 'self', 'href': '/items/{id}'}]
+        for link in range(self.fanout):
+            links.append({
+                'rel': 'link%d' % link,
+                'href': '/items/{id}/related%d{?page}' % link,
+            })
+
+        return {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': properties,
+            'required': ['id'],
+            'links': links,
+        }
+
+    def collection_schema(self):
+        return {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer'},
+                'items': {
+                    'type': 'array',
+                    'items': {'$ref': self.url('/schema#')},
+                },
+            },
+            'links': [{'rel': 'next', 'href': '/collection?page={next}'}],
+        }
+
+    def item(self, item_id):
+        item = {
+            'id': str(item_id),
+            'address': {'line': 'Main street %s' % item_id, 'zipcode': 1},
+        }
+        for field in range(self.fields):
+            item['field%d' % field] = 'value %d of %s' % (field, item_id)
+        return item
+
+    def collection(self):
+        return {
+            'count': self.items,
+            'items': [self.item(index) for index in range(self.items)],
+        }
+
+    def route(self, path):
+        path = path.split('?', 1)[0]
+        if path == '/schema':
+            return self.item_schema(), None
+        if path == '/collection-schema':
+            return self.collection_schema(), None
+        if path == '/definitions':
+            return self.definitions(), None
+        if path == '/collection':
+            return self.collection(), self.url('/collection-schema')
+        if path.startswith('/items/'):
+            return self.item(path.split('/')[2]), self.url('/schema')
+        return None, None
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written apart, without this every keep-alive
+    # response waits for the delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        data, profile = self.server.api.route(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+
+        body = self.server.bodies.get(self.path)
+        if body is None:
+            body = json.dumps(data).encode('utf-8')
+            self.server.bodies[self.path] = body
+
+        content_type = 'application/json'
+        if profile is not None:
+            content_type += '; profile=' + profile
+
+        self.send_response(200)
+        self.send_header('content-type', content_type)
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class LocalServer(object):
+
+    def __init__(self, api):
+        self.api = api
+        self.server = ThreadingServer(('127.0.0.1', 0), Handler)
+        self.server.api = api
+        self.server.bodies = {}
+        api.base_url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from itertools import cycle
+
+from pluct.schema import Schema
+from pluct.session import Session
+
+
+class Suite(object):
+
+    def __init__(self, api):
+        self.api = api
+
+    def benchmarks(self):
+        return [
+            ('session_resource', self.setup_item, self.session_resource),
+            ('resource_rel', self.setup_item, self.resource_rel),
+            ('resource_getitem', self.setup_collection,
+             self.resource_getitem),
+            ('schema_data', self.setup_raw_schema, self.schema_data),
+            ('is_valid', self.setup_item, self.is_valid),
+            ('is_valid_collection', self.setup_collection, self.is_valid),
+            ('is_valid_unchanged', self.setup_collection,
+             self.is_valid_unchanged),
+            ('resource_stream', self.setup_session, self.resource_stream),
+        ]
+
+    def setup_session(self):
+        session = Session()
+        # Loads the profiles, so the benchmarks measure warm sessions
+        session.resource(self.api.url('/items/0')).is_valid()
+        return {'session': session}
+
+    def setup_item(self):
+        state = self.setup_session()
+        state['resource'] = state['session'].resource(
+            self.api.url('/items/0'))
+        state['rels'] = cycle(
+            'link%d' % link for link in range(self.api.fanout))
+        return state
+
+    def setup_collection(self):
+        state = self.setup_session()
+        state['resource'] = state['session'].resource(
+            self.api.url('/collection'))
+        return state
+
+    def setup_raw_schema(self):
+        state = self.setup_session()
+        state['raw_schema'] = state['session'].request_json(
+            self.api.url('/collection-schema'))
+        return state
+
+    def session_resource(self, state):
+        state['session'].resource(self.api.url('/items/1'))
+
+    def resource_rel(self, state):
+        state['resource'].rel(next(state['rels']), params={'page': 2})
+
+    def resource_getitem(self, state):
+        for item in state['resource']['items']:
+            item['address']['zipcode']
+
+    def schema_data(self, state):
+        session = state['session']
+        url = self.api.url('/collection-schema')
+
+        # A schema out of the store, so its references are expanded again
+        session.store.pop(url + '#', None)
+        schema = Schema(url, raw_schema=state['raw_schema'], session=session)
+        schema['properties']['items']['items']['properties']
+
+    def is_valid(self, state):
+        state['resource'].is_valid()
+
+    def is_valid_unchanged(self, state):
+        # Only checks the changes since the last validation, none here
+        state['resource'].is_valid(incremental=True)
+
+    def resource_stream(self, state):
+        for item in state['session'].resource(
+                self.api.url('/collection'), stream=True, member='items'):
+            item['id']
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import os
+
 # Used to mock validate method on tests
 from pluct import resource
 resources = resource
@@ -8,7 +10,7 @@ from pluct.resource import Resource  # noqa
 from pluct.schema import LazySchema, Schema  # noqa
 from pluct.session import Session as Pluct  # noqa
 
-_pluct = Pluct()
+_pluct = Pluct(schema_cache=os.environ.get('PLUCT_SCHEMA_CACHE'))
 
 resource = _pluct.resource
 schema = _pluct.schema
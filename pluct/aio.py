@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from functools import partial
+
+from pluct.exceptions import SchemaNotLoadedError
+from pluct.instrumentation import clock, response_size
+from pluct.resource import Resource
+from pluct.retry import discard_response
+from pluct.schema import (
+    LazySchema, Schema, get_external_urls, get_profile_from_header)
+from pluct.session import PreloadReport, Session
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class AsyncSession(Session):
+
+    def __init__(self, client=None, **kwargs):
+        if client is None:
+            if httpx is None:
+                raise ImportError(
+                    'AsyncSession needs an async HTTP client, install httpx '
+                    'or use the client argument')
+            client = httpx.AsyncClient()
+
+        super(AsyncSession, self).__init__(client=client, **kwargs)
+        self.schema_loads = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        close = getattr(self.client, 'aclose', None)
+        if close is not None:
+            await close()
+
+        close = getattr(self.retry, 'close', None)
+        if close is not None:
+            close()
+
+    def resource(self, url, **kwargs):
+        # The hooks context is read on the call, as callers like rel()
+        # leave it before the coroutine runs
+        return self._resource(url, self.hooks.current_context(), kwargs)
+
+    async def _resource(self, url, context, kwargs):
+        response = await self._request(url, context, kwargs)
+        schema = None
+
+        schema_url = get_profile_from_header(response.headers)
+        if schema_url is not None:
+            schema = LazySchema(href=schema_url, session=self)
+            await self.load_schema(schema)
+
+        resource = Resource.from_response(
+            response=response, session=self, schema=schema)
+        if isinstance(resource, Resource):
+            resource.url = str(resource.url)
+        return resource
+
+    async def schema(self, url, **kwargs):
+        data = self.decode_response(await self.request(url, **kwargs))
+        schema = Schema(url, raw_schema=data, session=self)
+        await self.load_refs(schema.raw_schema)
+        return schema
+
+    async def load_schema(self, schema):
+        if isinstance(schema, LazySchema):
+            root = await self._load_url(schema.url)
+            if schema is not root and schema._raw_schema is None:
+                schema._share(root)
+
+        await self.load_refs(schema.raw_schema)
+        return schema
+
+    async def load_refs(self, raw_schema):
+        loaded = set()
+        urls = get_external_urls(raw_schema)
+
+        while urls:
+            loaded.update(urls)
+            schemas = await asyncio.gather(
+                *[self._load_url(url) for url in urls])
+
+            urls = set()
+            for schema in schemas:
+                urls.update(get_external_urls(schema.raw_schema))
+            urls -= loaded
+
+    async def preload(self, urls, max_workers=None):
+        started = time.time()
+        loaded = {}
+        failed = {}
+        run = self._limited(max_workers)
+
+        async def load(url):
+            url_started = time.time()
+            try:
+                schema = await self._load_url(url)
+                schema.data
+            except Exception as error:
+                failed[url] = error
+                return set()
+            loaded[url] = time.time() - url_started
+            return get_external_urls(schema.raw_schema)
+
+        seen = set(url.split('#', 1)[0] for url in urls)
+        pending = set(
+            asyncio.ensure_future(run(url, partial(load, url)))
+            for url in seen)
+
+        # References are loaded as soon as their parent is
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, refs = task.result()
+                for ref in refs - seen:
+                    seen.add(ref)
+                    pending.add(
+                        asyncio.ensure_future(run(ref, partial(load, ref))))
+
+        return PreloadReport(loaded, failed, time.time() - started)
+
+    def run_many(self, calls, max_workers=None, as_completed=False):
+        if as_completed:
+            return self._iter_completed(calls, max_workers)
+        return self._gather(calls, max_workers)
+
+    async def _gather(self, calls, max_workers):
+        run = self._limited(max_workers)
+        results = await asyncio.gather(
+            *[run(index, call) for index, call in enumerate(calls)])
+        return [result for index, result in results]
+
+    async def _iter_completed(self, calls, max_workers):
+        run = self._limited(max_workers)
+        tasks = [
+            asyncio.ensure_future(run(index, call))
+            for index, call in enumerate(calls)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _limited(self, max_workers):
+        semaphore = asyncio.Semaphore(max_workers or self.max_workers)
+
+        async def run(index, call):
+            async with semaphore:
+                return index, await call()
+        return run
+
+    async def refresh_schema(self, schema, force=False):
+        schema._revalidate = False
+        if not force and schema.is_fresh():
+            return False
+
+        response = await self.request(
+            schema.url, headers=schema.conditional_headers())
+        return schema.reload(response)
+
+    async def _load_url(self, url):
+        schema = LazySchema(url, session=self)
+        if not isinstance(schema, LazySchema):
+            return schema
+
+        if schema._raw_schema is not None and not schema._revalidate:
+            return schema
+
+        # Concurrent navigations wait on the same fetch, which is shielded
+        # so a cancelled caller does not cancel it for the others
+        task = self.schema_loads.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(schema))
+            self.schema_loads[url] = task
+            task.add_done_callback(
+                lambda task: self.schema_loads.pop(url, None))
+
+        return await asyncio.shield(task)
+
+    async def _fetch(self, schema):
+        if schema._raw_schema is None:
+            started = clock()
+            cache = self.schema_cache
+            if cache is None or not cache.restore(schema):
+                schema.load(await self.request(schema.url))
+                self.hooks.emit(
+                    'schema_fetched', url=schema.url, source='network',
+                    duration=clock() - started)
+                return schema
+
+            self.hooks.emit(
+                'schema_fetched', url=schema.url, source='cache',
+                duration=clock() - started)
+
+        if schema._revalidate:
+            await self.refresh_schema(schema)
+        return schema
+
+    def request_schema(self, url, **kwargs):
+        raise SchemaNotLoadedError(
+            'Schema {0} is not loaded, use AsyncSession.load_schema before '
+            'accessing it'.format(url))
+
+    def request_json(self, url):
+        schema = self.store.get(url.split('#', 1)[0] + '#')
+        if getattr(schema, '_raw_schema', None) is None:
+            self.request_schema(url)
+        return schema._raw_schema
+
+    def request(self, url, **kwargs):
+        return self._request(url, self.hooks.current_context(), kwargs)
+
+    async def _request(self, url, context, kwargs):
+        retry = kwargs.pop('retry', None)
+        options = self.request_options(kwargs)
+
+        policy = self.retry if retry is None else retry
+        if not policy or not policy.applies(options['method']):
+            return await self._send_async(url, options, context)
+        return await run_policy(
+            policy, partial(self._send_async, url, options, context))
+
+    async def _send_async(self, url, options, context):
+        info = dict(context, url=url, method=options['method'])
+
+        self.hooks.emit('before_request', **info)
+        started = clock()
+        try:
+            response = await self.client.request(url=url, **options)
+        except Exception as error:
+            self.hooks.emit(
+                'after_request', error=error, duration=clock() - started,
+                **info)
+            raise
+
+        if self.hooks.enabled('after_request'):
+            self.hooks.emit(
+                'after_request', status=response.status_code,
+                duration=clock() - started, size=response_size(response),
+                **info)
+
+        # Some clients also raise for redirects, 304 is a valid answer here
+        if response.status_code >= 400:
+            response.raise_for_status()
+
+        return response
+
+
+async def run_policy(policy, send):
+    # RetryPolicy.run for coroutines: backoff sleeps without blocking the
+    # loop, and hedges are tasks, the slower ones cancelled
+    policy._count('requests')
+    attempt = 0
+    while True:
+        try:
+            return await _attempt(policy, send)
+        except Exception as error:
+            if attempt >= policy.retries or not is_retryable(policy, error):
+                raise
+            discard_response(getattr(error, 'response', None))
+
+        delay = policy.delay(attempt)
+        attempt += 1
+        policy._count('retries')
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def is_retryable(policy, error):
+    if httpx is not None:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in policy.status
+        if isinstance(error, httpx.TransportError):
+            return True
+    return policy.is_retryable(error)
+
+
+async def _attempt(policy, send):
+    if policy.hedge_after is None or policy.hedges < 1:
+        return await send()
+
+    first = asyncio.ensure_future(send())
+    pending = set([first])
+    errors = []
+    sent = 1
+    try:
+        while pending:
+            can_hedge = sent <= policy.hedges
+            done, pending = await asyncio.wait(
+                pending, timeout=policy.hedge_after if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    if task is not first:
+                        policy._count('hedge_wins')
+                    return task.result()
+                errors.append(error)
+
+            if not done:
+                pending.add(asyncio.ensure_future(send()))
+                sent += 1
+                policy._count('hedges')
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise errors[0]
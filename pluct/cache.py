@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import atexit
+import json
+import os
+import tempfile
+from threading import RLock
+
+from pluct.schema import LazySchema
+
+replace = getattr(os, 'replace', os.rename)
+
+
+class SchemaCache(object):
+
+    # Stored as JSON, as the file may come from the environment and
+    # loading it must not run code
+    VERSION = 2
+
+    def __init__(self, path, autosave=True):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self._lock = RLock()
+
+        self.load()
+
+        if autosave:
+            atexit.register(self.save)
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as cache_file:
+                content = json.loads(cache_file.read().decode('utf-8'))
+            version = content['version']
+            entries = dict(
+                (url, tuple(entry))
+                for url, entry in content['entries'].items()
+                if len(entry) == 4)
+        except (IOError, OSError, ValueError, TypeError, KeyError,
+                AttributeError):
+            return
+
+        if version != self.VERSION:
+            return
+
+        with self._lock:
+            self.entries.update(entries)
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            data = json.dumps(
+                {'version': self.VERSION, 'entries': self.entries},
+                separators=(',', ':')).encode('utf-8')
+            self.dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.pluct-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def update(self, schema, raw_schema=None):
+        with self._lock:
+            if raw_schema is None:
+                if schema.url not in self.entries:
+                    return
+                raw_schema = self.entries[schema.url][0]
+
+            self.entries[schema.url] = (
+                raw_schema, schema.etag, schema.last_modified,
+                schema.expires)
+            self.dirty = True
+
+    def restore(self, schema):
+        entry = self.entries.get(schema.url)
+        if entry is None:
+            return False
+
+        schema.restore(*entry)
+        return True
+
+    def prewarm(self, session):
+        schemas = []
+        for url in list(self.entries):
+            schema = LazySchema(url, session=session)
+            if schema._raw_schema is None:
+                self.restore(schema)
+            schemas.append(schema)
+        return schemas
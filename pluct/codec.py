@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from pluct.datastructures import string_types
+
+
+class JSONCodec(object):
+
+    name = 'json'
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def decode_response(self, response):
+        return response.json()
+
+
+class OrjsonCodec(JSONCodec):
+
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('OrjsonCodec needs orjson, install it first')
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def decode_response(self, response):
+        # Decodes the raw bytes, skipping the text decoding of requests
+        return orjson.loads(response.content)
+
+
+CODECS = {
+    JSONCodec.name: JSONCodec,
+    OrjsonCodec.name: OrjsonCodec,
+}
+
+
+def get_codec(codec=None):
+    if codec is None:
+        return JSONCodec()
+    if isinstance(codec, string_types):
+        try:
+            return CODECS[codec]()
+        except KeyError:
+            raise ValueError('Unknown codec {0!r}, use one of {1}'.format(
+                codec, ', '.join(sorted(CODECS))))
+    return codec
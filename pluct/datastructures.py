@@ -9,3 +9,195 @@ try:
     from UserList import UserList
 except ImportError:
     from collections import UserList  # noqa
+
+try:
+    string_types = (basestring,)
+except NameError:
+    string_types = (str,)
+
+try:
+    from collections.abc import MutableMapping, MutableSequence
+except ImportError:
+    from collections import MutableMapping, MutableSequence  # noqa
+
+try:
+    from collections import ChainMap
+except ImportError:
+    class ChainMap(object):
+
+        def __init__(self, *maps):
+            self.maps = list(maps)
+
+        def __contains__(self, key):
+            return any(key in mapping for mapping in self.maps)
+
+        def __getitem__(self, key):
+            for mapping in self.maps:
+                if key in mapping:
+                    return mapping[key]
+            raise KeyError(key)
+
+        def get(self, key, default=None):
+            return self[key] if key in self else default
+
+
+# UserDict and UserList keep their state on the instance __dict__. These
+# versions wrap ``self.data`` the same way with no state of their own, so
+# subclasses can use __slots__. Every method of dict and list is defined,
+# as the built-in storage of dict and list subclasses is left empty.
+
+class SlottedUserDict(MutableMapping):
+
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, item):
+        self.data[key] = item
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __repr__(self):
+        return repr(self.data)
+
+    def __or__(self, other):
+        data = dict(self.data)
+        data.update(other)
+        return data
+
+    def __ror__(self, other):
+        data = dict(other)
+        data.update(self.data)
+        return data
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        return self.__copy__()
+
+
+class SlottedUserList(MutableSequence):
+
+    __slots__ = ()
+
+    def _cast(self, other):
+        return other.data if isinstance(other, SlottedUserList) else other
+
+    def __lt__(self, other):
+        return self.data < self._cast(other)
+
+    def __le__(self, other):
+        return self.data <= self._cast(other)
+
+    def __eq__(self, other):
+        return self.data == self._cast(other)
+
+    def __ne__(self, other):
+        return self.data != self._cast(other)
+
+    def __gt__(self, other):
+        return self.data > self._cast(other)
+
+    def __ge__(self, other):
+        return self.data >= self._cast(other)
+
+    __hash__ = None
+
+    def __contains__(self, item):
+        return item in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __reversed__(self):
+        return reversed(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, item):
+        self.data[index] = item
+
+    def __delitem__(self, index):
+        del self.data[index]
+
+    # Python 2 lists have their own slicing methods
+    def __getslice__(self, i, j):
+        return self[max(0, i):max(0, j)]
+
+    def __setslice__(self, i, j, other):
+        self[max(0, i):max(0, j)] = other
+
+    def __delslice__(self, i, j):
+        del self[max(0, i):max(0, j)]
+
+    def __add__(self, other):
+        return self.data + list(self._cast(other))
+
+    def __radd__(self, other):
+        return list(self._cast(other)) + self.data
+
+    def __iadd__(self, other):
+        self.data += self._cast(other)
+        return self
+
+    def __mul__(self, n):
+        return self.data * n
+
+    __rmul__ = __mul__
+
+    def __imul__(self, n):
+        self.data *= n
+        return self
+
+    def __repr__(self):
+        return repr(self.data)
+
+    def append(self, item):
+        self.data.append(item)
+
+    def insert(self, index, item):
+        self.data.insert(index, item)
+
+    def pop(self, index=-1):
+        return self.data.pop(index)
+
+    def remove(self, item):
+        self.data.remove(item)
+
+    def clear(self):
+        del self.data[:]
+
+    def copy(self):
+        return self.__copy__()
+
+    def count(self, item):
+        return self.data.count(item)
+
+    def index(self, item, *args):
+        return self.data.index(item, *args)
+
+    def reverse(self):
+        self.data.reverse()
+
+    def sort(self, *args, **kwargs):
+        self.data.sort(*args, **kwargs)
+
+    def extend(self, other):
+        self.data.extend(self._cast(other))
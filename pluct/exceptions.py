@@ -1,3 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from requests import HTTPError  # noqa
+
+
+class SchemaNotLoadedError(RuntimeError):
+    pass
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, local
+
+clock = getattr(time, 'perf_counter', time.time)
+
+EVENTS = (
+    'before_request',
+    'after_request',
+    'response_decoded',
+    'schema_fetched',
+    'schema_resolved',
+    'store_hit',
+    'store_miss',
+    'validation_start',
+    'validation_end',
+)
+
+ALL_EVENTS = '*'
+
+
+def response_size(response):
+    try:
+        return int(response.headers['content-length'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Hooks(object):
+
+    def __init__(self):
+        self.handlers = {}
+        self.lock = Lock()
+        self.local = local()
+
+    def add(self, event, handler):
+        if event != ALL_EVENTS and event not in EVENTS:
+            raise ValueError('Unknown event {0!r}'.format(event))
+
+        # Handler lists are replaced, never changed, so emit needs no lock
+        with self.lock:
+            self.handlers[event] = self.handlers.get(event, ()) + (handler,)
+
+    def remove(self, event, handler):
+        with self.lock:
+            handlers = list(self.handlers.get(event, ()))
+            handlers.remove(handler)
+            self.handlers[event] = tuple(handlers)
+
+    def enabled(self, event):
+        return bool(self.handlers.get(event) or
+                    self.handlers.get(ALL_EVENTS))
+
+    def emit(self, event, **info):
+        handlers = (self.handlers.get(event, ()) +
+                    self.handlers.get(ALL_EVENTS, ()))
+        if not handlers:
+            return
+
+        context = self.current_context()
+        for key, value in context.items():
+            info.setdefault(key, value)
+
+        for handler in handlers:
+            handler(event, info)
+
+    @contextmanager
+    def context(self, **info):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+
+        stack.append(info)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def current_context(self):
+        context = {}
+        for info in getattr(self.local, 'stack', ()):
+            context.update(info)
+        return context
+
+
+class Histogram(object):
+
+    # Upper bounds of the buckets, in seconds
+    BUCKETS = (
+        0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+        1.0, 2.0, 5.0, 10.0, float('inf'))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.counts[bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent):
+        if not self.count:
+            return None
+
+        # Upper bound of the bucket holding the percentile, capped by the
+        # largest value seen
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean(),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class StatsCollector(object):
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def attach(self, session):
+        session.hooks.add(ALL_EVENTS, self)
+        return self
+
+    def detach(self, session):
+        session.hooks.remove(ALL_EVENTS, self)
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.sizes = {}
+            self.latencies = {}
+
+    def __call__(self, event, info):
+        duration = info.get('duration')
+        size = info.get('size')
+
+        with self.lock:
+            self.counters[event] = self.counters.get(event, 0) + 1
+            if size is not None:
+                self.sizes[event] = self.sizes.get(event, 0) + size
+
+            if duration is None:
+                return
+
+            keys = [(event, None, None)]
+            if info.get('template') is not None:
+                keys.append((event, 'template', info['template']))
+            if info.get('rel') is not None:
+                keys.append((event, 'rel', info['rel']))
+
+            for key in keys:
+                histogram = self.latencies.get(key)
+                if histogram is None:
+                    histogram = self.latencies[key] = Histogram()
+                histogram.add(duration)
+
+    def latency(self, event, template=None, rel=None):
+        if template is not None:
+            key = (event, 'template', template)
+        elif rel is not None:
+            key = (event, 'rel', rel)
+        else:
+            key = (event, None, None)
+        return self.latencies.get(key) or Histogram()
+
+    def snapshot(self):
+        with self.lock:
+            latencies = {}
+            for (event, kind, name), histogram in self.latencies.items():
+                group = latencies.setdefault(event, {})
+                if kind is None:
+                    group['all'] = histogram.as_dict()
+                else:
+                    group.setdefault(kind, {})[name] = histogram.as_dict()
+
+            return {
+                'counters': dict(self.counters),
+                'sizes': dict(self.sizes),
+                'latencies': latencies,
+            }
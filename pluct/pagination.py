@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+from threading import Event, Semaphore, Thread
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping  # noqa
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+def iter_pages(page, rel='next', prefetch=1, **kwargs):
+    if prefetch < 1:
+        return _follow(page, rel, kwargs)
+    return _read_ahead(page, rel, kwargs, prefetch)
+
+
+def next_page(page, rel, kwargs):
+    link = None
+    if page.schema is not None:
+        link = page.schema.link_index.get(rel)
+    if link is None:
+        return None
+
+    # The last page usually has the link on its schema, but not the data
+    # to expand it
+    params = kwargs.get('params') or {}
+    data = page.data if isinstance(page.data, Mapping) else {}
+    for variable in link.variables:
+        if params.get(variable, data.get(variable)) is None:
+            return None
+
+    return page.rel(rel, **dict(kwargs))
+
+
+def _follow(page, rel, kwargs):
+    while page is not None:
+        yield page
+        page = next_page(page, rel, kwargs)
+
+
+def _read_ahead(page, rel, kwargs, depth):
+    pages = Queue()
+    slots = Semaphore(depth)
+    stop = Event()
+
+    def fetch():
+        current = page
+        try:
+            while current is not None:
+                # Each slot is a page fetched ahead and not yet consumed
+                slots.acquire()
+                if stop.is_set():
+                    return
+                current = next_page(current, rel, kwargs)
+                pages.put((current, None))
+        except Exception as error:
+            pages.put((None, error))
+
+    thread = Thread(target=fetch)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        yield page
+        while True:
+            current, error = pages.get()
+            if error is not None:
+                raise error
+            if current is None:
+                return
+            slots.release()
+            yield current
+    finally:
+        stop.set()
+        slots.release()
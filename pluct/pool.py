@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from pluct.instrumentation import clock
+
+DEFAULT_POOL_CONNECTIONS = 10
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class PoolingAdapter(HTTPAdapter):
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_CONNECTIONS, pool_block=False,
+                 idle_timeout=None, clock=clock):
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.evictions = 0
+        self._last_used = {}
+        self._next_eviction = None
+        self._lock = Lock()
+        super(PoolingAdapter, self).__init__(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block)
+
+    def send(self, request, **kwargs):
+        now = self.clock()
+        with self._lock:
+            if self.idle_timeout is not None:
+                self._evict_idle(now)
+            self._last_used[host_key(request.url)] = now
+        return super(PoolingAdapter, self).send(request, **kwargs)
+
+    def evict_idle(self):
+        with self._lock:
+            self._next_eviction = None
+            self._evict_idle(self.clock())
+
+    def _evict_idle(self, now):
+        # Checked at most twice per timeout, the pools of hosts idle for
+        # longer than the timeout are closed with their connections
+        if self._next_eviction is not None and now < self._next_eviction:
+            return
+        self._next_eviction = now + self.idle_timeout / 2.0
+
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            host = (key.key_scheme, key.key_host, key.key_port)
+            last_used = self._last_used.get(host)
+            if last_used is None or now - last_used >= self.idle_timeout:
+                del pools[key]
+                self._last_used.pop(host, None)
+                self.evictions += 1
+
+    def close(self):
+        with self._lock:
+            self._last_used.clear()
+        super(PoolingAdapter, self).close()
+
+
+def host_key(url):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    return (scheme, (parts.hostname or '').lower(),
+            parts.port or DEFAULT_PORTS.get(scheme))
+
+
+def pool_stats(adapters):
+    hosts = {}
+    evictions = 0
+    for adapter in adapters:
+        evictions += getattr(adapter, 'evictions', 0)
+        poolmanager = getattr(adapter, 'poolmanager', None)
+        if poolmanager is None:
+            continue
+
+        # Read without touching the pools, which would change the order
+        # they are discarded in
+        pools = poolmanager.pools
+        with pools.lock:
+            items = list(pools._container.items())
+
+        for key, pool in items:
+            name = '%s://%s:%s' % (key.key_scheme, key.key_host, key.key_port)
+            idle = [conn for conn in list(pool.pool.queue) if conn is not None]
+            hosts[name] = {
+                'maxsize': pool.pool.maxsize,
+                'idle': len(idle),
+                'opened': pool.num_connections,
+                'requests': pool.num_requests,
+            }
+
+    return {'hosts': hosts, 'evictions': evictions}
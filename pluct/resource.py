@@ -1,58 +1,178 @@
 # -*- coding: utf-8 -*-
 
-import uritemplate
+import re
+from copy import copy
+from functools import partial
+
 import jsonpointer
-import json
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping  # noqa
 
 try:
     from urllib.parse import urlparse, urljoin
 except ImportError:
     from urlparse import urlparse, urljoin
 
-from jsonschema import SchemaError, validate, ValidationError, RefResolver
+from jsonschema import SchemaError
+
+from pluct import datastructures, validation
+from pluct.instrumentation import clock
+from pluct.pagination import iter_pages
 
-from pluct import datastructures
-from pluct.schema import Schema
+FIRST_CHARACTER = re.compile(br'\s*(.)', re.DOTALL)
 
 
 class Resource(object):
 
+    # Kept on the slots of the concrete classes, as a class can not have
+    # slots from two bases
+    __slots__ = ()
+    SLOTS = ('url', '_data', '_decode', 'schema', 'session', 'response',
+             'headers', '_children', '_owner', '_dirty', '_validator')
+
     def __init__(self, *args, **kwargs):
         raise NotImplementedError(
             'Use subclasses or Resource.from_data to initialize resources')
 
     def init(self, url, data=None, schema=None, session=None, response=None,
-             headers=None):
+             headers=None, decode=None):
+        # Keys changed since the last successful validation, None when the
+        # whole data must be validated again
+        self._dirty = None
+        self._validator = None
+        self._owner = None
         self.url = url
-        self.data = data or self.default_data()
+        self.data = self.default_data() if data is None else data
+        self._decode = decode
         self.schema = schema
         self.session = session
         self.response = response
         self.headers = headers
+        self._children = None
+
+    @property
+    def data(self):
+        decode = self._decode
+        if decode is not None:
+            # Concurrent first reads may both decode, to the same data
+            try:
+                data = decode()
+            except ValueError:
+                data = self.default_data()
+            self._data = data
+            self._decode = None
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._decode = None
+        self._changed()
+
+    @property
+    def is_decoded(self):
+        return self._decode is None
 
     def session_request_json(self, url):
-        return self.session.request(url).json()
+        return self.session.decode_response(self.session.request(url))
 
-    def is_valid(self):
-        handlers = {'https': self.session_request_json,
-                    'http': self.session_request_json}
-        resolver = RefResolver.from_schema(self.schema.raw_schema,
-                                           handlers=handlers)
+    def is_valid(self, incremental=False):
         try:
-            validate(self.data, self.schema.raw_schema, resolver=resolver)
-        except (SchemaError, ValidationError):
+            validator = self.session.validator(self.schema)
+        except SchemaError:
+            return False
+
+        hooks = self.session.hooks
+        hooks.emit('validation_start', url=self.url, schema=self.schema.href)
+        started = clock()
+
+        # Incremental validation only checks the keys changed through the
+        # resource since its last successful validation
+        dirty = self._dirty
+        if (not incremental or dirty is None or
+                self._validator is not validator):
+            valid = validator.is_valid(self.data)
+        else:
+            valid = self._is_valid_changes(validator, dirty)
+
+        if valid:
+            self._dirty = set()
+            self._validator = validator
+        else:
+            self._dirty = None
+            self._validator = None
+
+        hooks.emit(
+            'validation_end', url=self.url, schema=self.schema.href,
+            valid=valid, duration=clock() - started)
+        return valid
+
+    def _is_valid_changes(self, validator, keys):
+        kind = self.SCHEMA_KIND
+        container = validation.split_schema(validator, kind)
+        if container is None:
+            return validator.is_valid(self.data)
+
+        if container and not validation.sub_validator(
+                validator, container).is_valid(self.data):
             return False
+
+        data = self.data
+        for key in keys:
+            try:
+                value = data[key]
+            except (KeyError, IndexError):
+                # Removed keys only matter to the container keywords
+                continue
+
+            schemas = validation.value_schemas(validator.schema, kind, key)
+            for schema in schemas:
+                if not self._is_valid_value(validator, key, value, schema):
+                    return False
         return True
 
+    def _is_valid_value(self, validator, key, value, schema):
+        # Children validated against the same schema only check their
+        # own changes
+        cached = (self._children or {}).get(key)
+        if cached is not None and cached[0] is value:
+            child = cached[1]
+            child_validator = child._validator
+            if (child_validator is not None and
+                    child_validator.schema is schema):
+                return child.is_valid(incremental=True)
+        return validation.sub_validator(validator, schema).is_valid(value)
+
+    def _changed(self, key=None):
+        dirty = self._dirty
+        if dirty is not None:
+            if key is None:
+                self._dirty = None
+            else:
+                dirty.add(key)
+
+        owner = self._owner
+        if owner is not None:
+            owner[0]._child_changed(owner[1], self)
+
+    def _child_changed(self, key, child):
+        try:
+            same = self.data[key] is child.data
+        except (KeyError, IndexError, TypeError):
+            same = False
+        # Children moved or replaced change the whole data
+        self._changed(key if same else None)
+
     def rel(self, name, **kwargs):
-        link = self.schema.get_link(name)
-        method = link.get('method', 'get').lower()
-        href = link.get('href', '')
+        link = self.schema.link_index.get(name)
+        method = link.method
+        variables = link.variables
 
         params = kwargs.get('params', {})
 
-        variables = uritemplate.variables(href)
-
         uri = self.expand_uri(name, **params)
 
         if not urlparse(uri).netloc:
@@ -67,18 +187,30 @@ class Resource(object):
             headers = kwargs.get('headers', {})
 
             if isinstance(resource, Resource):
-                kwargs["data"] = json.dumps(resource.data)
+                kwargs["data"] = self.session.codec.dumps(resource.data)
                 headers.setdefault(
                     'content-type',
                     self._get_content_type_for_resource(resource))
 
             elif isinstance(resource, dict):
-                kwargs["data"] = json.dumps(resource)
+                kwargs["data"] = self.session.codec.dumps(resource)
                 headers.setdefault('content-type', 'application/json')
 
             kwargs['headers'] = headers
 
-        return self.session.resource(uri, method=method, **kwargs)
+        # Async sessions read the context when called, as it is left
+        # before their coroutine runs
+        with self.session.hooks.context(rel=name, template=link.href):
+            return self.session.resource(uri, method=method, **kwargs)
+
+    def pages(self, rel='next', prefetch=1, **kwargs):
+        return iter_pages(self, rel=rel, prefetch=prefetch, **kwargs)
+
+    def paginate(self, rel='next', member=None, prefetch=1, **kwargs):
+        for page in self.pages(rel=rel, prefetch=prefetch, **kwargs):
+            items = page if member is None else page[member]
+            for index in range(len(items)):
+                yield items[index]
 
     def _get_content_type_for_resource(self, resource):
         response = resource.response
@@ -89,16 +221,21 @@ class Resource(object):
             return 'application/json; profile=' + resource.schema.url
 
     def has_rel(self, name):
-        link = self.schema.get_link(name)
-        return bool(link)
+        return name in self.schema.link_index
 
     def expand_uri(self, name, **kwargs):
-        link = self.schema.get_link(name)
-        href = link.get('href', '')
-
-        context = dict(self.data, **kwargs)
+        link = self.schema.link_index.get(name)
+
+        # Look variables up on the params and then on the resource data,
+        # without copying the data. Lazy data is only decoded when a
+        # variable is missing from the params.
+        if (any(name not in kwargs for name in link.variables) and
+                isinstance(self.data, Mapping)):
+            context = datastructures.ChainMap(kwargs, self.data)
+        else:
+            context = kwargs
 
-        return uritemplate.expand(href, context)
+        return link.template.expand(context)
 
     @classmethod
     def from_data(cls, url, data=None, schema=None, session=None,
@@ -116,8 +253,16 @@ class Resource(object):
 
     @classmethod
     def from_response(cls, response, session, schema):
+        if getattr(session, 'lazy', False):
+            klass = cls.class_for_content(response.content)
+            if klass is not None:
+                return klass(
+                    url=response.url, session=session, schema=schema,
+                    response=response, headers=response.headers,
+                    decode=partial(session.decode_response, response))
+
         try:
-            data = response.json()
+            data = session.decode_response(response)
         except ValueError:
             data = {}
         return cls.from_data(
@@ -129,20 +274,69 @@ class Resource(object):
             headers=response.headers
         )
 
+    @staticmethod
+    def class_for_content(content):
+        # Peeks at the first character, without copying the content
+        match = FIRST_CHARACTER.match(content or b'')
+        character = match and match.group(1)
+        if character == b'{':
+            return ObjectResource
+        if character == b'[':
+            return ArrayResource
+        return None
+
+    def __copy__(self):
+        cls = self.__class__
+        resource = cls.__new__(cls)
+        resource.init(
+            self.url, data=copy(self.data), schema=self.schema,
+            session=self.session, response=self.response,
+            headers=self.headers)
+        return resource
+
     def resolve_pointer(self, *args, **kwargs):
         return jsonpointer.resolve_pointer(self.data, *args, **kwargs)
 
     def __getitem__(self, item):
-        schema = self.item_schema(item)
+        data = self.data[item]
+
+        children = self._children
+        if children is None:
+            children = self._children = {}
+
+        try:
+            cached = children.get(item)
+        except TypeError:
+            # Unhashable items, like slices, are not cached
+            return self._wrap_item(item, data)
+
+        if cached is not None and cached[0] is data:
+            return cached[1]
+
+        child = self._wrap_item(item, data)
+        if isinstance(child, Resource):
+            child._owner = (self, item)
+            children[item] = (data, child)
+        return child
+
+    def _wrap_item(self, item, data):
         return self.from_data(self.url,
-                              data=self.data[item],
-                              schema=schema,
+                              data=data,
+                              schema=self.item_schema(item),
                               session=self.session)
 
+    def item_schema(self, key):
+        if self.schema is None:
+            return None
+        return self.schema.sub_schema(self.item_pointer(key))
+
 
-class ObjectResource(datastructures.IterableUserDict, Resource, dict):
+class ObjectResource(datastructures.SlottedUserDict, Resource, dict):
+
+    __slots__ = Resource.SLOTS
 
     SCHEMA_PREFIX = 'properties'
+    SCHEMA_KIND = 'object'
 
     def __init__(self, *args, **kwargs):
         self.init(*args, **kwargs)
@@ -153,9 +347,20 @@ class ObjectResource(datastructures.IterableUserDict, Resource, dict):
     def iterate_items(self):
         return iter(self.data.items())
 
-    def item_schema(self, key):
-        href = '#/{0}/{1}'.format(self.SCHEMA_PREFIX, key)
-        return Schema(href, raw_schema=self.schema, session=self.session)
+    def item_pointer(self, key):
+        return '/{0}/{1}'.format(self.SCHEMA_PREFIX, key)
+
+    def __setitem__(self, key, item):
+        if self._children is not None:
+            self._children.pop(key, None)
+        self.data[key] = item
+        self._changed(key)
+
+    def __delitem__(self, key):
+        if self._children is not None:
+            self._children.pop(key, None)
+        del self.data[key]
+        self._changed(key)
 
     def __ne__(self, other):
         return self.data != other
@@ -170,9 +375,12 @@ class ObjectResource(datastructures.IterableUserDict, Resource, dict):
         return "<Pluct ObjectResource %s>" % self.data
 
 
-class ArrayResource(datastructures.UserList, Resource, list):
+class ArrayResource(datastructures.SlottedUserList, Resource, list):
+
+    __slots__ = Resource.SLOTS
 
     SCHEMA_PREFIX = 'items'
+    SCHEMA_KIND = 'array'
 
     def __init__(self, *args, **kwargs):
         self.init(*args, **kwargs)
@@ -183,12 +391,74 @@ class ArrayResource(datastructures.UserList, Resource, list):
     def iterate_items(self):
         return enumerate(self.data)
 
-    def item_schema(self, key):
-        href = '#/{0}'.format(self.SCHEMA_PREFIX)
-        return Schema(href, raw_schema=self.schema, session=self.session)
+    def item_pointer(self, key):
+        return '/{0}'.format(self.SCHEMA_PREFIX)
 
     def __getitem__(self, item):
         return Resource.__getitem__(self, item)
 
+    def validate_items(self, **kwargs):
+        return self.session.validate_items(
+            self.item_schema(0), self.data, **kwargs)
+
+    def __setitem__(self, index, item):
+        self._children = None
+        self.data[index] = item
+        if isinstance(index, int):
+            self._changed(index % len(self.data))
+        else:
+            self._changed()
+
+    def __delitem__(self, index):
+        self._children = None
+        del self.data[index]
+        self._changed()
+
+    # Changes that move items validate the whole array again, appended
+    # items are validated on their own
+
+    def append(self, item):
+        self.data.append(item)
+        self._changed(len(self.data) - 1)
+
+    def extend(self, other):
+        start = len(self.data)
+        self.data.extend(self._cast(other))
+        for index in range(start, len(self.data)):
+            self._changed(index)
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        self.data *= n
+        self._changed()
+        return self
+
+    def insert(self, index, item):
+        self.data.insert(index, item)
+        self._changed()
+
+    def pop(self, index=-1):
+        item = self.data.pop(index)
+        self._changed()
+        return item
+
+    def remove(self, item):
+        self.data.remove(item)
+        self._changed()
+
+    def clear(self):
+        del self[:]
+
+    def reverse(self):
+        self.data.reverse()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        self.data.sort(*args, **kwargs)
+        self._changed()
+
     def __repr__(self):
         return "<Pluct ArrayResource %s>" % self.data
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import time
+from collections import OrderedDict
+from email.utils import mktime_tz, parsedate_tz
+from threading import RLock
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+from pluct.codec import JSONCodec
+from pluct.instrumentation import response_size
+from pluct.schema import get_max_age_from_header
+
+SAFE_METHODS = ('get', 'head')
+
+# HEAD responses have no body, they are neither cached nor served from
+# the cache
+CACHEABLE_METHODS = ('get',)
+
+CACHEABLE_STATUS = (200, 203)
+
+
+class CachedResponse(object):
+
+    def __init__(self, url, data, headers, expires, size, vary=None,
+                 content=None):
+        self.url = url
+        # Either the encoded body, decoded again for each use, or the
+        # decoded data shared by every use
+        self.content = content
+        self.data = data
+        self.headers = headers
+        self.expires = expires
+        self.size = size
+        # Request headers named by Vary, all must match to reuse it
+        self.vary = vary or {}
+
+    @property
+    def etag(self):
+        return self.headers.get('etag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('last-modified')
+
+    def matches(self, headers):
+        headers = headers or {}
+        return all(
+            headers.get(name) == value for name, value in self.vary.items())
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag is not None:
+            headers['if-none-match'] = self.etag
+        if self.last_modified is not None:
+            headers['if-modified-since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+
+    def __init__(self, max_size=1000, max_bytes=None, copy=True,
+                 clock=time.time):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.copy = copy
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url
+        if hasattr(params, 'items'):
+            params = params.items()
+        separator = '&' if '?' in url else '?'
+        return url + separator + urlencode(sorted(params))
+
+    def get(self, key, headers=None):
+        # Headers are the lower cased request headers
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            if not entry.matches(headers):
+                # Another variant, kept until this one is stored
+                self._entries[key] = entry
+                self.misses += 1
+                return None
+
+            self._entries[key] = entry
+            if self.is_fresh(entry):
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def is_fresh(self, entry):
+        return entry.expires > self.clock()
+
+    def store(self, key, response, data, headers=None, authorized=False,
+              codec=None):
+        lifetime = get_freshness_lifetime(response.headers, self.clock())
+        if (response.status_code not in CACHEABLE_STATUS or
+                lifetime is None or
+                not is_shareable(response.headers, authorized)):
+            # Not cacheable, also drop what was cached for the key
+            self.invalidate(key)
+            return None
+
+        response_headers = dict(
+            (name.lower(), value) for name, value in response.headers.items())
+        content = None
+        if self.copy:
+            # Decoding the body again is cheaper than copying the data
+            content = get_content(response)
+            if content is None:
+                content = (codec or JSONCodec()).dumps(data)
+            data = None
+
+        headers = headers or {}
+        vary = dict(
+            (name, headers.get(name))
+            for name in get_vary(response_headers))
+
+        entry = CachedResponse(
+            url=response.url, data=data, headers=response_headers,
+            expires=self.clock() + lifetime, size=get_size(response),
+            vary=vary, content=content)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self.bytes += entry.size
+            self._evict()
+        return entry
+
+    def revalidated(self, key, entry, response):
+        # A 304 answer updates the headers of the cached response
+        for name, value in response.headers.items():
+            entry.headers[name.lower()] = value
+
+        lifetime = get_freshness_lifetime(entry.headers, self.clock())
+        with self._lock:
+            self.revalidations += 1
+            if lifetime is None:
+                self._remove(key)
+            else:
+                entry.expires = self.clock() + lifetime
+
+    def data(self, entry, codec=None):
+        if entry.content is None:
+            return entry.data
+        return (codec or JSONCodec()).loads(entry.content)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'evictions': self.evictions,
+        }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def _evict(self):
+        while self._entries and (
+                (self.max_size is not None and
+                 len(self._entries) > self.max_size) or
+                (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            key, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.size
+            self.evictions += 1
+
+
+def get_freshness_lifetime(headers, now):
+    cache_control = headers.get('cache-control', '').lower()
+    if 'no-store' in cache_control or headers.get('vary') == '*':
+        return None
+
+    lifetime = get_max_age_from_header(headers)
+    if lifetime is None and headers.get('expires'):
+        expires = parse_date(headers['expires'])
+        date = parse_date(headers.get('date')) or now
+        lifetime = 0 if expires is None else max(expires - date, 0)
+
+    if lifetime is None:
+        # Without freshness information only responses with validators
+        # are kept, to be revalidated on every use
+        if 'etag' not in headers and 'last-modified' not in headers:
+            return None
+        lifetime = 0
+
+    try:
+        lifetime -= int(headers.get('age', 0))
+    except ValueError:
+        pass
+    return max(lifetime, 0)
+
+
+def is_shareable(headers, authorized=False):
+    # Private responses are for a single user, as are the responses to
+    # authorized requests unless the server marks them as public
+    directives = get_cache_directives(headers)
+    if 'private' in directives:
+        return False
+    return not authorized or 'public' in directives
+
+
+def get_cache_directives(headers):
+    cache_control = headers.get('cache-control', '')
+    return set(
+        directive.split('=', 1)[0].strip().lower()
+        for directive in cache_control.split(','))
+
+
+def get_vary(headers):
+    return sorted(set(
+        name.strip().lower()
+        for name in headers.get('vary', '').split(',') if name.strip()))
+
+
+def parse_date(value):
+    if not value:
+        return None
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return mktime_tz(parsed)
+
+
+def get_content(response):
+    content = getattr(response, 'content', None)
+    return content if isinstance(content, bytes) else None
+
+
+def get_size(response):
+    size = response_size(response)
+    if size is None:
+        content = getattr(response, 'content', None)
+        size = len(content) if isinstance(content, bytes) else 0
+    return size
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import random
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait)
+from threading import Lock, Thread
+
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+IDEMPOTENT_METHODS = ('get', 'head', 'options', 'put', 'delete')
+
+RETRY_STATUS = (500, 502, 503, 504)
+
+
+class RetryPolicy(object):
+
+    def __init__(self, retries=2, backoff=0.1, max_backoff=2.0,
+                 status=RETRY_STATUS, methods=IDEMPOTENT_METHODS,
+                 hedge_after=None, hedges=1, max_workers=10,
+                 random=random.random, sleep=time.sleep):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.status = status
+        self.methods = methods
+        self.hedge_after = hedge_after
+        self.hedges = hedges
+        self.max_workers = max_workers
+        self.random = random
+        self.sleep = sleep
+
+        self._counts = {'requests': 0, 'retries': 0, 'hedges': 0,
+                        'hedge_wins': 0}
+        self._lock = Lock()
+        self._executor = None
+
+    def applies(self, method):
+        return method.lower() in self.methods
+
+    def run(self, send):
+        self._count('requests')
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(send)
+            except Exception as error:
+                if attempt >= self.retries or not self.is_retryable(error):
+                    raise
+                discard_response(getattr(error, 'response', None))
+
+            delay = self.delay(attempt)
+            attempt += 1
+            self._count('retries')
+            if delay > 0:
+                self.sleep(delay)
+
+    def is_retryable(self, error):
+        if isinstance(error, HTTPError):
+            response = error.response
+            return response is not None and response.status_code in self.status
+        return isinstance(error, (ConnectionError, Timeout))
+
+    def delay(self, attempt):
+        # Full jitter, so clients failing together do not retry together
+        ceiling = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return self.random() * ceiling
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _attempt(self, send):
+        if self.hedge_after is None or self.hedges < 1:
+            return send()
+
+        # The first attempt runs on a thread of its own, so it never
+        # waits for the pool, and only hedges are sent to the pool
+        first = start_thread(send)
+        pending = set([first])
+        errors = []
+        sent = 1
+
+        while pending:
+            can_hedge = sent <= self.hedges
+            done, pending = wait(
+                pending, timeout=self.hedge_after if can_hedge else None,
+                return_when=FIRST_COMPLETED)
+
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is not first:
+                        self._count('hedge_wins')
+                    # Slower requests can not be stopped, their responses
+                    # are closed as they arrive
+                    for other in pending:
+                        other.add_done_callback(discard_future)
+                    return future.result()
+                errors.append(error)
+
+            if not done:
+                # Still waiting after the threshold, send a duplicate
+                pending.add(self._get_executor().submit(send))
+                sent += 1
+                self._count('hedges')
+
+        raise errors[0]
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers)
+            return self._executor
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+
+def start_thread(function):
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = function()
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    thread = Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return future
+
+
+def discard_future(future):
+    if not future.cancelled() and future.exception() is None:
+        discard_response(future.result())
+
+
+def discard_response(response):
+    close = getattr(response, 'close', None)
+    if close is not None:
+        close()
@@ -1,10 +1,22 @@
 # -*- coding: utf-8 -*-
 
+import time
 from cgi import parse_header
+from collections import namedtuple
+from threading import Lock
 
-from jsonpointer import resolve_pointer
+from jsonpointer import JsonPointer, JsonPointerException
 
-from pluct.datastructures import IterableUserDict
+from pluct.datastructures import IterableUserDict, string_types
+from pluct.instrumentation import clock
+from pluct.uri import compile_template
+from pluct.validation import value_schemas
+
+
+Link = namedtuple('Link', 'rel method href variables template link')
+
+# Guards the creation of documents, so schemas of a root share one
+_documents_lock = Lock()
 
 
 class Schema(IterableUserDict, object):
@@ -15,11 +27,17 @@ class Schema(IterableUserDict, object):
 
         session = kwargs['session']
 
-        if href in session.store:
-            return session.store[href]
+        schema = session.store.get(href)
+        if schema is not None:
+            session.hooks.emit('store_hit', href=href)
+            return schema
 
+        session.hooks.emit('store_miss', href=href)
         instance = super(Schema, cls).__new__(cls)
-        session.store[href] = instance
+        stored = session.store.setdefault(href, instance)
+        if stored is not instance:
+            # Another thread stored the schema first
+            return stored
 
         if pointer:
             # Reuse the constructor to make it register the root schema
@@ -29,69 +47,124 @@ class Schema(IterableUserDict, object):
         return instance
 
     def __init__(self, href, raw_schema=None, session=None):
+        if (raw_schema is not None and
+                getattr(self, 'session', None) is session and
+                getattr(self, '_raw_schema', None) is raw_schema):
+            # Already on the session store, keep the resolved data
+            return
+
         self._init_href(href)
         self._data = None
         self._raw_schema = raw_schema
+        self._link_index = None
+        self._sub_schemas = {}
+        self._document = None
+        self._parent = None
         self.session = session
 
     @property
     def __class__(self):
         return dict
 
-    def _is_simple_dict(self, obj):
-        return isinstance(obj, dict) and (not isinstance(obj, Schema))
-
-    def expand_refs(self, item):
-        if self._is_simple_dict(item):
-            iterator = iter(item.items())
-        elif isinstance(item, list):
-            iterator = enumerate(item)
-        else:
-            return
-
-        for key, value in iterator:
-            key_ref_in_dict = (
-                self._is_simple_dict(value) and ('$ref' in value)
-            )
-
-            if key_ref_in_dict:
-                item[key] = self.from_href(
-                    value['$ref'], raw_schema=self._raw_schema,
-                    session=self.session)
-                continue
-            self.expand_refs(value)
-
     @property
     def data(self):
-        if self._data is None:
-            self._data = self.resolve()
-        return self._data
+        data = self._data
+        if data is None:
+            document = self.document
+            data = self.resolve(document)
+            # Data of a raw schema replaced meanwhile is not kept, the
+            # next read resolves it again
+            if self.document is document:
+                self._data = data
+        return data
 
     @property
     def raw_schema(self):
         return self._raw_schema
 
-    @classmethod
-    def from_href(cls, href, raw_schema, session):
-        href, url, pointer = cls._split_href(href)
-        is_external = url != ''
+    @property
+    def document(self):
+        if self._parent is not None:
+            return self._parent.document
+
+        raw_schema = self.raw_schema
+        document = self._document
+        if document is None or document.raw is not raw_schema:
+            with _documents_lock:
+                document = self._document
+                if document is None or document.raw is not raw_schema:
+                    document = self._find_document(raw_schema)
+                    self._document = document
+        return document
 
-        if is_external:
-            return LazySchema(href, session=session)
+    @property
+    def document_pointer(self):
+        if self._parent is None:
+            return self.pointer
+        return self._parent.document_pointer + self.pointer
+
+    def _find_document(self, raw_schema):
+        # Schemas on pointers of a stored root share its document, so
+        # every pointer of the root is resolved only once
+        root = self.session.store.get(self.url + '#')
+        if (root is None or root is self or
+                getattr(root, '_raw_schema', None) is not raw_schema):
+            return Document(raw_schema, session=self.session, url=self.url)
+
+        document = getattr(root, '_document', None)
+        if document is None or document.raw is not raw_schema:
+            document = Document(
+                raw_schema, session=self.session, url=self.url)
+            root._document = document
+        return document
+
+    def sub_schema(self, pointer):
+        schema = self._sub_schemas.get(pointer)
+        if schema is None:
+            # Sub schemas resolve the pointer on this schema data, they are
+            # kept here instead of the session store, where relative hrefs
+            # of different schemas would clash
+            schema = IterableUserDict.__new__(Schema)
+            schema.__init__(
+                '#' + pointer, raw_schema=self, session=self.session)
+            schema._parent = self
+            schema = self._sub_schemas.setdefault(pointer, schema)
+        return schema
+
+    def resolve(self, document=None):
+        if document is None:
+            document = self.document
+
+        started = clock()
+        data = document.resolve(self.document_pointer)
+
+        self.session.hooks.emit(
+            'schema_resolved', url=self.url, pointer=self.pointer,
+            duration=clock() - started)
+        return data
 
-        return Schema(href, raw_schema=raw_schema, session=session)
+    def __repr__(self):
+        # References are represented as they are on the raw schema
+        return repr(self.document.original(self.data))
 
-    def resolve(self):
-        data = resolve_pointer(self.raw_schema, self.pointer)
-        self.expand_refs(data)
-        return data
+    @property
+    def link_index(self):
+        links = self.get('links') or ()
+        cached = self._link_index
+        if cached is None or cached[0] is not links:
+            index = {}
+            for link in links:
+                rel = link.get('rel')
+                if rel is not None and rel not in index:
+                    index[rel] = parse_link(link)
+            self._link_index = cached = (links, index)
+        return cached[1]
 
     def get_link(self, name):
-        links = self.get('links') or []
-        for link in links:
-            if link.get('rel') == name:
-                return link
-        return None
+        link = self.link_index.get(name)
+        if link is None:
+            return None
+        return link.link
 
     def _init_href(self, href):
         (self.href, self.url, self.pointer) = self._split_href(href)
@@ -113,22 +186,336 @@ class Schema(IterableUserDict, object):
 class LazySchema(Schema):
 
     def __init__(self, href, session=None):
+        if getattr(self, 'session', None) is session:
+            # Already on the session store, keep the loaded schema
+            return
+
         self._init_href(href)
         self.session = session
         self._data = None
         self._raw_schema = None
+        self._link_index = None
+        self._sub_schemas = {}
+        self._document = None
+        self._parent = None
+
+        self.etag = None
+        self.last_modified = None
+        self.expires = None
+        self._revalidate = False
 
     @property
     def raw_schema(self):
         if self._raw_schema is None:
-            response = self.session.request(self.url)
-            self._raw_schema = response.json()
+            # Only one fetch per url at a time, concurrent callers wait
+            # for it and share the loaded schema
+            schema = self.session.schema_fetches.do(self.url, self._fetch)
+            if schema is not self:
+                self._share(schema)
+
+        if self._revalidate:
+            self._revalidate = False
+            self.refresh()
+
         return self._raw_schema
 
+    def _fetch(self):
+        if self._raw_schema is not None:
+            return self
+
+        root = self.session.store.get(self.url + '#')
+        if self.pointer and getattr(root, '_raw_schema', None) is not None:
+            self._share(root)
+            return self
+
+        started = clock()
+        source = 'cache'
+
+        cache = self.session.schema_cache
+        if cache is None or not cache.restore(self):
+            source = 'network'
+            self.load(self.session.request_schema(self.url))
+
+        self.session.hooks.emit(
+            'schema_fetched', url=self.url, source=source,
+            duration=clock() - started)
+        return self
+
+    def _share(self, schema):
+        self._raw_schema = schema._raw_schema
+        self._data = None
+        self._sub_schemas = {}
+
+        self.etag = getattr(schema, 'etag', None)
+        self.last_modified = getattr(schema, 'last_modified', None)
+        self.expires = getattr(schema, 'expires', None)
+
+    def load(self, response):
+        raw_schema = self.session.decode_response(response)
+        self._raw_schema = raw_schema
+        self._data = None
+        self._sub_schemas = {}
+
+        self.etag = None
+        self.last_modified = None
+        self.revalidated(response, raw_schema)
+
+    def restore(self, raw_schema, etag, last_modified, expires):
+        self._raw_schema = raw_schema
+        self._data = None
+        self._sub_schemas = {}
+
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        self._revalidate = True
+
+    def revalidated(self, response, raw_schema=None):
+        headers = response.headers
+        self.etag = headers.get('etag', self.etag)
+        self.last_modified = headers.get('last-modified', self.last_modified)
+
+        max_age = get_max_age_from_header(headers)
+        if max_age is None:
+            self.expires = None
+        else:
+            self.expires = time.time() + max_age
+
+        cache = self.session.schema_cache
+        if cache is not None:
+            cache.update(self, raw_schema)
+
+    def is_fresh(self):
+        if self._raw_schema is None or self.expires is None:
+            return False
+        return self.expires > time.time()
+
+    def refresh(self, force=False):
+        if self._raw_schema is None:
+            self.raw_schema
+            return True
+
+        if not force and self.is_fresh():
+            return False
+
+        response = self.session.request_schema(
+            self.url, headers=self.conditional_headers())
+        return self.reload(response)
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag is not None:
+            headers['if-none-match'] = self.etag
+        if self.last_modified is not None:
+            headers['if-modified-since'] = self.last_modified
+        return headers
+
+    def reload(self, response):
+        if response.status_code == 304:
+            self.revalidated(response)
+            return False
+
+        self.load(response)
+        return True
+
     def __repr__(self):
         return repr({'$ref': self.href})
 
 
+class Document(object):
+
+    def __init__(self, raw, session, url=''):
+        self.raw = raw
+        self.session = session
+        self.url = url
+        # Resolved pointers and expanded nodes are shared by every schema
+        # of the document, the raw schema itself is never changed
+        self._resolved = {}
+        self._expanded = {}
+        self._originals = {}
+        self._refs = {}
+        self._raw_nodes = {}
+
+    def resolve(self, pointer, seen=frozenset()):
+        try:
+            return self._resolved[pointer]
+        except KeyError:
+            pass
+
+        seen = seen | set([pointer])
+        node, expanded = self.raw, False
+        for part in JsonPointer(pointer).parts:
+            node, expanded = self._follow(node, expanded, seen)
+            while isinstance(node, Schema):
+                node = node.data
+            node = self._step(node, part)
+
+        node, expanded = self._follow(node, expanded, seen)
+        if not expanded:
+            node = self.expand(node)
+
+        # Published without locks, so documents referencing each other
+        # can not deadlock. Threads racing on a pointer may resolve it
+        # twice, but all of them get the first published data.
+        return self._resolved.setdefault(pointer, node)
+
+    def raw_node(self, pointer):
+        try:
+            return self._raw_nodes[pointer]
+        except KeyError:
+            pass
+
+        node = self._find_raw_node(pointer, frozenset())
+        return self._raw_nodes.setdefault(pointer, node)
+
+    def _find_raw_node(self, pointer, seen):
+        # Raw schema a value on the pointer validates with, also for
+        # members that are not declared, as the validator would
+        parts = JsonPointer(pointer).parts
+        node = self.raw
+        index = 0
+        while index < len(parts):
+            if is_ref(node):
+                url, _, fragment = node['$ref'].partition('#')
+                rest = JsonPointer.from_parts(parts[index:]).path
+                href = url + '#' + fragment + rest
+                if url or href in seen or self._has_node(fragment + rest):
+                    # Points into the referenced schema, so the reference
+                    # is left to the validator resolver
+                    return {'$ref': href}
+                return self._find_raw_node(fragment + rest, seen | {href})
+
+            part = parts[index]
+            if (part == 'properties' and index + 1 < len(parts) and
+                    isinstance(node, dict) and
+                    parts[index + 1] not in node.get('properties', {})):
+                node = member_schema(node, parts[index + 1])
+                index += 2
+                continue
+
+            try:
+                node = self._step(node, part)
+            except JsonPointerException:
+                # Nothing constrains values on missing keywords
+                return {}
+            index += 1
+
+        return node
+
+    def _has_node(self, pointer):
+        node = self.raw
+        for part in JsonPointer(pointer).parts:
+            if is_ref(node):
+                return False
+            try:
+                node = self._step(node, part)
+            except JsonPointerException:
+                return False
+        return True
+
+    def expand(self, node):
+        if isinstance(node, Schema) or not isinstance(node, (dict, list)):
+            return node
+
+        cached = self._expanded.get(id(node))
+        if cached is not None:
+            return cached[1]
+
+        if isinstance(node, dict):
+            items = [
+                (key, self._expand_value(value))
+                for key, value in node.items()]
+            changed = any(node[key] is not value for key, value in items)
+            expanded = dict(items) if changed else node
+        else:
+            items = [self._expand_value(value) for value in node]
+            changed = any(a is not b for a, b in zip(node, items))
+            expanded = items if changed else node
+
+        # Nodes without references are shared as they are, the raw node
+        # is kept alive so its id is not reused
+        cached = self._expanded.setdefault(id(node), (node, expanded))
+        if changed and cached[1] is expanded:
+            self._originals[id(expanded)] = node
+        return cached[1]
+
+    def original(self, node):
+        return self._originals.get(id(node), node)
+
+    def ref(self, href):
+        schema = self._refs.get(href)
+        if schema is None:
+            if href.startswith('#'):
+                # Local references belong to this document, they are kept
+                # out of the session store like sub schemas
+                schema = IterableUserDict.__new__(Schema)
+                schema.__init__(
+                    self.url + href, raw_schema=self.raw,
+                    session=self.session)
+                schema._document = self
+            else:
+                schema = LazySchema(href, session=self.session)
+            schema = self._refs.setdefault(href, schema)
+        return schema
+
+    def _expand_value(self, value):
+        if is_ref(value):
+            # References are replaced by schemas resolved on demand, so
+            # recursive schemas do not expand forever
+            return self.ref(value['$ref'])
+        return self.expand(value)
+
+    def _follow(self, node, expanded, seen):
+        if expanded or not is_ref(node):
+            return node, expanded
+
+        href = node['$ref']
+        if not href.startswith('#'):
+            return self.ref(href), True
+
+        pointer = href[1:]
+        if pointer in seen:
+            # Circular chain of references, kept as it is
+            return dict(node), True
+        return self.resolve(pointer, seen), True
+
+    def _step(self, node, part):
+        try:
+            if isinstance(node, list):
+                return node[int(part)]
+            return node[part]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise JsonPointerException(
+                'Member %r not found in %r' % (part, self.url))
+
+
+def is_ref(node):
+    return (
+        isinstance(node, dict) and not isinstance(node, Schema) and
+        isinstance(node.get('$ref'), string_types))
+
+
+def member_schema(schema, key):
+    schemas = value_schemas(schema, 'object', key)
+    if not schemas:
+        return {}
+    if len(schemas) == 1:
+        return schemas[0]
+    return {'allOf': schemas}
+
+
+def parse_link(link):
+    href = link.get('href', '')
+    template = compile_template(href)
+    return Link(
+        rel=link.get('rel'),
+        method=link.get('method', 'get').lower(),
+        href=href,
+        variables=template.variables,
+        template=template,
+        link=link)
+
+
 def get_profile_from_header(headers):
     if 'content-type' not in headers:
         return None
@@ -141,3 +528,43 @@ def get_profile_from_header(headers):
 
     schema_url = parameters['profile']
     return schema_url
+
+
+def get_max_age_from_header(headers):
+    if 'cache-control' not in headers:
+        return None
+
+    directives = {}
+    for directive in headers['cache-control'].split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name.lower()] = value.strip('"')
+
+    if 'no-cache' in directives or 'no-store' in directives:
+        return 0
+
+    try:
+        return max(int(directives['max-age']), 0)
+    except (KeyError, ValueError):
+        return None
+
+
+def get_external_urls(raw_schema):
+    urls = set()
+    items = [raw_schema]
+
+    while items:
+        item = items.pop()
+        if isinstance(item, LazySchema):
+            # References already expanded into schemas
+            urls.add(item.url)
+        elif isinstance(item, Schema):
+            continue
+        elif isinstance(item, dict):
+            ref = item.get('$ref')
+            if isinstance(ref, string_types) and not ref.startswith('#'):
+                urls.add(ref.split('#', 1)[0])
+            items.extend(item.values())
+        elif isinstance(item, list):
+            items.extend(item)
+
+    return urls
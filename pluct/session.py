@@ -1,38 +1,463 @@
 # -*- coding: utf-8 -*-
 
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait)
+from concurrent.futures import as_completed as iter_completed
+from functools import partial
+from multiprocessing import cpu_count
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping  # noqa
+
+from jsonschema import RefResolver
+from jsonschema.validators import validator_for
 from requests import Session as RequestsSession
 
+from pluct.cache import SchemaCache
+from pluct.codec import get_codec
+from pluct.datastructures import string_types
+from pluct.instrumentation import Hooks, clock, response_size
+from pluct.pool import DEFAULT_POOL_CONNECTIONS, PoolingAdapter, pool_stats
 from pluct.resource import Resource
-from pluct.schema import Schema, LazySchema, get_profile_from_header
+from pluct.response_cache import CACHEABLE_METHODS, SAFE_METHODS
+from pluct.schema import (
+    LazySchema, Schema, get_external_urls, get_profile_from_header)
+from pluct.singleflight import SingleFlight
+from pluct.store import SchemaStore
+from pluct.streaming import iter_json_array
+from pluct.validation import sub_validator, validate_chunk, validate_item
+
+CHUNK_SIZE = 64 * 1024
+
+PreloadReport = namedtuple('PreloadReport', 'loaded failed elapsed')
+
+# Smaller batches are validated on the calling process, where starting the
+# worker processes would cost more than the validation
+PARALLEL_THRESHOLD = 1000
 
 
 class Session(object):
 
-    def __init__(self, client=None, timeout=None):
+    def __init__(self, client=None, timeout=None, store=None,
+                 schema_cache=None, max_workers=10, codec=None,
+                 response_cache=None, lazy=False,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=None,
+                 pool_block=False, keep_alive=True, idle_timeout=None,
+                 retry=None):
         self.timeout = timeout
-        self.store = {}
+        self.max_workers = max_workers
+        self.lazy = lazy
+        self.retry = retry
+        self.codec = get_codec(codec)
+        self.hooks = Hooks()
+
+        if store is None:
+            self.store = SchemaStore()
+        else:
+            self.store = store
+
+        if isinstance(schema_cache, string_types):
+            schema_cache = SchemaCache(schema_cache)
+        self.schema_cache = schema_cache
+        self.response_cache = response_cache
+        self.schema_fetches = SingleFlight()
+        self.validators = {}
 
         if client is None:
             self.client = RequestsSession()
+
+            # Enough connections per host for the batch helpers, so
+            # concurrent requests reuse warm connections
+            if pool_maxsize is None:
+                pool_maxsize = max(max_workers, DEFAULT_POOL_CONNECTIONS)
+            adapter = PoolingAdapter(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                pool_block=pool_block, idle_timeout=idle_timeout)
+            self.client.mount('http://', adapter)
+            self.client.mount('https://', adapter)
+
+            if not keep_alive:
+                self.client.headers['connection'] = 'close'
         else:
             self.client = client
 
-    def resource(self, url, **kwargs):
+    def pool_stats(self):
+        adapters = getattr(self.client, 'adapters', {})
+        # The same adapter may be mounted for many prefixes
+        unique = dict((id(adapter), adapter) for adapter in adapters.values())
+        return pool_stats(unique.values())
+
+    def close(self):
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            close()
+
+        # Also stops the threads the retry policy keeps for hedges
+        close = getattr(self.retry, 'close', None)
+        if close is not None:
+            close()
+
+    def resource(self, url, stream=False, member=None, **kwargs):
+        if stream:
+            return self.resource_items(url, member=member, **kwargs)
+
+        if self.response_cache is not None:
+            return self._cached_resource(url, kwargs)
+
         response = self.request(url, **kwargs)
-        schema = None
+        return Resource.from_response(
+            response=response, session=self,
+            schema=self.response_schema(response))
+
+    def _cached_resource(self, url, kwargs):
+        cache = self.response_cache
+        key = cache.key(url, kwargs.get('params'))
+
+        method = kwargs.get('method', 'get').lower()
+        if method not in CACHEABLE_METHODS or 'data' in kwargs:
+            response = self.request(url, **kwargs)
+            if method not in SAFE_METHODS or 'data' in kwargs:
+                # Unsafe requests make the cached response of the url stale
+                cache.invalidate(key)
+            return Resource.from_response(
+                response=response, session=self,
+                schema=self.response_schema(response))
+
+        request_headers = self._request_headers(kwargs)
+        authorized = (
+            'authorization' in request_headers or
+            kwargs.get('auth') is not None or
+            getattr(self.client, 'auth', None) is not None)
+
+        entry = cache.get(key, request_headers)
+        if entry is not None and cache.is_fresh(entry):
+            return self._from_cache(entry)
+
+        if entry is not None:
+            headers = dict(kwargs.get('headers') or {})
+            headers.update(entry.conditional_headers())
+            kwargs['headers'] = headers
 
+        response = self.request(url, **kwargs)
+        if entry is not None and response.status_code == 304:
+            cache.revalidated(key, entry, response)
+            return self._from_cache(entry)
+
+        resource = Resource.from_response(
+            response=response, session=self,
+            schema=self.response_schema(response))
+        cache.store(
+            key, response, getattr(resource, 'data', resource),
+            headers=request_headers, authorized=authorized, codec=self.codec)
+        return resource
+
+    def _request_headers(self, kwargs):
+        # Headers sent with the request, lower cased, including the ones
+        # set on the client
+        headers = {}
+        for source in (getattr(self.client, 'headers', None),
+                       kwargs.get('headers')):
+            if isinstance(source, Mapping):
+                for name, value in source.items():
+                    headers[name.lower()] = value
+        return headers
+
+    def _from_cache(self, entry):
+        schema = self.response_schema(entry)
+        content = entry.content
+        if self.lazy and isinstance(content, bytes):
+            klass = Resource.class_for_content(content)
+            if klass is not None:
+                return klass(
+                    url=entry.url, session=self, schema=schema,
+                    headers=entry.headers,
+                    decode=partial(self.codec.loads, content))
+
+        try:
+            data = self.response_cache.data(entry, self.codec)
+        except ValueError:
+            data = {}
+        return Resource.from_data(
+            entry.url, data=data, schema=schema, session=self,
+            headers=entry.headers)
+
+    def resource_items(self, url, member=None, chunk_size=CHUNK_SIZE,
+                       **kwargs):
+        response = self.request(url, stream=True, **kwargs)
+
+        schema = self.response_schema(response)
+        if schema is not None:
+            pointer = '/items'
+            if member is not None:
+                pointer = '/properties/{0}/items'.format(member)
+            schema = schema.sub_schema(pointer)
+
+        return self._iter_items(response, schema, member, chunk_size)
+
+    def _iter_items(self, response, schema, member, chunk_size):
+        try:
+            items = iter_json_array(
+                response.iter_content(chunk_size=chunk_size),
+                member=member,
+                encoding=response.encoding or 'utf-8')
+            for item in items:
+                yield Resource.from_data(
+                    response.url, data=item, schema=schema, session=self)
+        finally:
+            response.close()
+
+    def response_schema(self, response):
+        # Anything with headers, like responses and cached responses
         schema_url = get_profile_from_header(response.headers)
-        if schema_url is not None:
-            schema = LazySchema(href=schema_url, session=self)
+        if schema_url is None:
+            return None
+        return LazySchema(href=schema_url, session=self)
 
-        return Resource.from_response(
-            response=response, session=self, schema=schema)
+    def resources(self, urls, max_workers=None, as_completed=False,
+                  **kwargs):
+        calls = [partial(self.resource, url, **kwargs) for url in urls]
+        return self.run_many(calls, max_workers, as_completed)
+
+    def rel_many(self, rels, max_workers=None, as_completed=False):
+        calls = []
+        for rel in rels:
+            resource, name = rel[:2]
+            kwargs = rel[2] if len(rel) > 2 else {}
+            calls.append(partial(resource.rel, name, **kwargs))
+        return self.run_many(calls, max_workers, as_completed)
+
+    def run_many(self, calls, max_workers=None, as_completed=False):
+        max_workers = min(max_workers or self.max_workers, len(calls))
+        executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+
+        if as_completed:
+            return self._iter_completed(executor, calls)
+
+        with executor:
+            futures = [executor.submit(call) for call in calls]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _iter_completed(self, executor, calls):
+        with executor:
+            futures = dict(
+                (executor.submit(call), index)
+                for index, call in enumerate(calls))
+            try:
+                for future in iter_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def preload(self, urls, max_workers=None):
+        started = time.time()
+        loaded = {}
+        failed = {}
+
+        seen = set(url.split('#', 1)[0] for url in urls)
+        executor = ThreadPoolExecutor(max_workers=max_workers or
+                                      self.max_workers)
+        with executor:
+            futures = dict(
+                (executor.submit(self._preload_schema, url), url)
+                for url in seen)
+
+            # References are submitted as soon as their parent is loaded
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = futures.pop(future)
+                    try:
+                        elapsed, refs = future.result()
+                    except Exception as error:
+                        failed[url] = error
+                        continue
+
+                    loaded[url] = elapsed
+                    for ref in refs - seen:
+                        seen.add(ref)
+                        future = executor.submit(self._preload_schema, ref)
+                        futures[future] = ref
+
+        return PreloadReport(loaded, failed, time.time() - started)
+
+    def _preload_schema(self, url):
+        started = time.time()
+        schema = LazySchema(url, session=self)
+
+        # Resolving the data creates the schemas for the references
+        schema.data
+        return time.time() - started, get_external_urls(schema.raw_schema)
+
+    def prewarm(self):
+        if self.schema_cache is None:
+            return []
+        return self.schema_cache.prewarm(self)
 
     def schema(self, url, **kwargs):
-        data = self.request(url, **kwargs).json()
+        data = self.decode_response(self.request(url, **kwargs))
         return Schema(url, raw_schema=data, session=self)
 
-    def request(self, url, **kwargs):
+    def validator(self, schema):
+        document = schema.document
+        pointer = schema.document_pointer
+        if not pointer:
+            return self._compile_validator(document.url + '#', document.raw)
+
+        # Schemas on pointers validate with the raw schema on the pointer,
+        # resolving references against the whole document. They are kept
+        # by their absolute location, as hrefs like '#/items' repeat
+        # across documents.
+        raw_schema = document.raw_node(pointer)
+        key = document.url + '#' + pointer
+        validator = self.validators.get(key)
+
+        if validator is None or validator.schema is not raw_schema:
+            root = self._compile_validator(document.url + '#', document.raw)
+            validator = sub_validator(root, raw_schema)
+            self.validators[key] = validator
+
+        return validator
+
+    def validate_many(self, resources, processes=None,
+                      parallel_threshold=PARALLEL_THRESHOLD):
+        resources = list(resources)
+        results = [None] * len(resources)
+
+        groups = OrderedDict()
+        for index, resource in enumerate(resources):
+            schema = resource.schema
+            groups.setdefault(id(schema), (schema, []))[1].append(index)
+
+        for schema, indexes in groups.values():
+            items = [resources[index].data for index in indexes]
+            group_results = self.validate_items(
+                schema, items, processes=processes,
+                parallel_threshold=parallel_threshold)
+            for index, result in zip(indexes, group_results):
+                results[index] = result
+
+        return results
+
+    def validate_items(self, schema, items, processes=None,
+                       parallel_threshold=PARALLEL_THRESHOLD):
+        # Compiled once, also checking the schema before any work is sent
+        validator = self.validator(schema)
+
+        if processes is None:
+            processes = cpu_count()
+        if processes <= 1 or len(items) < parallel_threshold:
+            return [validate_item(validator, item) for item in items]
+
+        document = schema.document
+        pointer = schema.document_pointer
+        raw_node = document.raw_node(pointer) if pointer else None
+        store = self._external_schemas(document.raw)
+        key = (document.url + '#' + pointer, id(document.raw))
+
+        size = -(-len(items) // (processes * 4))
+        tasks = [
+            (key, document.raw, raw_node, store, items[start:start + size])
+            for start in range(0, len(items), size)]
+
+        results = []
+        with ProcessPoolExecutor(processes) as executor:
+            for chunk in executor.map(validate_chunk, tasks):
+                results.extend(chunk)
+        return results
+
+    def _external_schemas(self, raw_schema):
+        # Raw schemas referenced by the document, loaded through the session
+        store = {}
+        urls = get_external_urls(raw_schema)
+        while urls:
+            url = urls.pop()
+            if url in store:
+                continue
+            store[url] = LazySchema(url, session=self).raw_schema
+            urls.update(get_external_urls(store[url]))
+        return store
+
+    def _compile_validator(self, href, raw_schema):
+        validator = self.validators.get(href)
+
+        if validator is None or validator.schema is not raw_schema:
+            cls = validator_for(raw_schema)
+            cls.check_schema(raw_schema)
+
+            handlers = {'https': self.request_json, 'http': self.request_json}
+            resolver = RefResolver.from_schema(raw_schema, handlers=handlers)
+
+            validator = cls(raw_schema, resolver=resolver)
+            self.validators[href] = validator
+
+        return validator
+
+    def request_schema(self, url, **kwargs):
+        return self.request(url, **kwargs)
+
+    def request_json(self, url):
+        return self.decode_response(self.request(url))
+
+    def decode_response(self, response):
+        started = clock()
+        data = self.codec.decode_response(response)
+
+        if self.hooks.enabled('response_decoded'):
+            self.hooks.emit(
+                'response_decoded', url=response.url,
+                duration=clock() - started, size=response_size(response))
+        return data
+
+    def request(self, url, retry=None, **kwargs):
+        options = self.request_options(kwargs)
+
+        policy = self.retry if retry is None else retry
+        if not policy or not policy.applies(options['method']):
+            return self._send(url, options)
+
+        # Attempts may run on other threads, keep the hooks context there
+        send = partial(
+            self._send_in_context, url, options,
+            self.hooks.current_context())
+        return policy.run(send)
+
+    def _send_in_context(self, url, options, context):
+        with self.hooks.context(**context):
+            return self._send(url, options)
+
+    def _send(self, url, options):
+        method = options['method']
+
+        self.hooks.emit('before_request', url=url, method=method)
+        started = clock()
+        try:
+            response = self.client.request(url=url, **options)
+        except Exception as error:
+            self.hooks.emit(
+                'after_request', url=url, method=method, error=error,
+                duration=clock() - started)
+            raise
+
+        if self.hooks.enabled('after_request'):
+            self.hooks.emit(
+                'after_request', url=url, method=method,
+                status=response.status_code, duration=clock() - started,
+                size=response_size(response))
+
+        response.raise_for_status()
+        return response
+
+    def request_options(self, kwargs):
         if self.timeout is not None:
             kwargs.setdefault('timeout', self.timeout)
 
@@ -41,7 +466,4 @@ class Session(object):
 
         kwargs.setdefault('method', 'get')
 
-        response = self.client.request(url=url, **kwargs)
-        response.raise_for_status()
-
-        return response
+        return kwargs
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import time
+from collections import OrderedDict
+from threading import RLock
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping  # noqa
+
+
+class SchemaStore(MutableMapping):
+
+    def __init__(self, max_size=None, ttl=None, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._children = {}
+        self._next_purge = None
+        self._lock = RLock()
+
+    def __getitem__(self, href):
+        with self._lock:
+            try:
+                schema, expires = self._entries.pop(href)
+            except KeyError:
+                self.misses += 1
+                raise
+
+            if self._is_expired(href, expires):
+                self._forget(href)
+                self.evictions += 1
+                self.misses += 1
+                raise KeyError(href)
+
+            self._entries[href] = (schema, expires)
+            self.hits += 1
+            return schema
+
+    def __setitem__(self, href, schema):
+        with self._lock:
+            if href in self._entries:
+                del self._entries[href]
+            else:
+                self._adopt(href)
+
+            expires = None
+            if self.ttl is not None:
+                expires = self.clock() + self.ttl
+            self._entries[href] = (schema, expires)
+
+            self._evict()
+
+    def __delitem__(self, href):
+        with self._lock:
+            del self._entries[href]
+            self._forget(href)
+
+    def setdefault(self, href, schema=None):
+        # Atomic, so concurrent misses store a single schema
+        with self._lock:
+            entry = self._entries.get(href)
+            if entry is not None and not self._is_expired(href, entry[1]):
+                return entry[0]
+            self[href] = schema
+            return schema
+
+    def __contains__(self, href):
+        with self._lock:
+            entry = self._entries.get(href)
+            if entry is None:
+                return False
+            return not self._is_expired(href, entry[1])
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._children.clear()
+
+    def purge(self):
+        with self._lock:
+            expired = [
+                href for href, (schema, expires) in self._entries.items()
+                if self._is_expired(href, expires)]
+            for href in expired:
+                del self[href]
+                self.evictions += 1
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def is_pinned(self, href):
+        return self._children.get(href, 0) > 0
+
+    def _is_expired(self, href, expires):
+        return (
+            expires is not None and expires <= self.clock() and
+            not self.is_pinned(href))
+
+    def _evict(self):
+        if self.ttl is not None:
+            now = self.clock()
+            if self._next_purge is None or self._next_purge <= now:
+                self._next_purge = now + self.ttl
+                self.purge()
+
+        if self.max_size is None:
+            return
+
+        # Evicting a pointer may unpin its root, so keep scanning from the
+        # least recently used entry until the store fits or nothing moves
+        while len(self._entries) > self.max_size:
+            evicted = False
+            for href in list(self._entries):
+                if len(self._entries) <= self.max_size:
+                    break
+                if self.is_pinned(href):
+                    continue
+                del self[href]
+                self.evictions += 1
+                evicted = True
+            if not evicted:
+                break
+
+    def _adopt(self, href):
+        root = _root_href(href)
+        if root is not None:
+            self._children[root] = self._children.get(root, 0) + 1
+
+    def _forget(self, href):
+        root = _root_href(href)
+        if root is None:
+            return
+
+        count = self._children.get(root, 0) - 1
+        if count > 0:
+            self._children[root] = count
+        else:
+            self._children.pop(root, None)
+
+
+def _root_href(href):
+    url, _, pointer = href.partition('#')
+    if not pointer:
+        return None
+    return url + '#'
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import codecs
+import json
+from numbers import Number
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',]}'
+
+
+def iter_json_array(chunks, member=None, encoding='utf-8'):
+    reader = JSONReader(chunks, encoding=encoding)
+
+    if member is not None and not reader.find_member(member):
+        return
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.decode()
+
+        separator = reader.read()
+        if separator == ']':
+            return
+        if separator != ',':
+            reader.fail("Expecting ',' or ']'")
+
+
+class JSONReader(object):
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder(encoding)()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def find_member(self, member):
+        self.expect('{')
+        if self.peek() == '}':
+            return False
+
+        while True:
+            key = self.decode()
+            self.expect(':')
+            if key == member:
+                return True
+
+            # Other members are decoded and dropped
+            self.decode()
+
+            separator = self.read()
+            if separator == '}':
+                return False
+            if separator != ',':
+                self.fail("Expecting ',' or '}'")
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position)
+            except ValueError:
+                if self.eof:
+                    raise
+                self.fill(len(self.buffer) - self.position)
+                continue
+
+            # Numbers may go on in the next chunk, they are only complete
+            # when followed by a delimiter
+            if isinstance(value, Number) and not isinstance(value, bool):
+                following = self.buffer[end:end + 1]
+                if not self.eof and (not following or
+                                     following not in DELIMITERS):
+                    self.fill(len(self.buffer) - self.position + 1)
+                    continue
+
+            self.position = end
+            return value
+
+    def expect(self, char):
+        if self.read() != char:
+            self.fail('Expecting {0!r}'.format(char))
+
+    def read(self):
+        char = self.peek()
+        self.position += 1
+        return char
+
+    def peek(self):
+        while True:
+            while (self.position < len(self.buffer) and
+                   self.buffer[self.position] in WHITESPACE):
+                self.position += 1
+
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                self.fail('Unexpected end of data')
+            self.fill(1)
+
+    def fill(self, size):
+        # Drop what was already read, so only the current value is buffered
+        pending = [self.buffer[self.position:]]
+        self.position = 0
+
+        read = 0
+        while read < size and not self.eof:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+                chunk = self.text_decoder.decode(b'', final=True)
+            elif isinstance(chunk, bytes):
+                chunk = self.text_decoder.decode(chunk)
+            pending.append(chunk)
+            read += len(chunk)
+
+        self.buffer = ''.join(pending)
+
+    def fail(self, message):
+        raise ValueError('{0} at position {1}'.format(
+            message, self.position))
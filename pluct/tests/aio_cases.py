@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+# Imported by test_aio only on Python 3.6+, as the syntax does not parse
+# on older versions
+
+import asyncio
+import json
+from unittest import TestCase
+
+from mock import patch
+
+from pluct.aio import AsyncSession
+from pluct.exceptions import HTTPError, SchemaNotLoadedError
+from pluct.resource import ObjectResource
+from pluct.retry import RetryPolicy
+from pluct.schema import LazySchema
+from pluct.tests.mocks import FakeResponse
+
+
+SCHEMA_URL = 'http://example.com/schema'
+DEFINITIONS_URL = 'http://example.com/definitions'
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'string'},
+        'address': {'$ref': DEFINITIONS_URL + '#/address'},
+    },
+    'links': [
+        {'rel': 'item', 'href': '/items/{id}'},
+        {'rel': 'create', 'href': '/items', 'method': 'POST'},
+    ],
+}
+
+DEFINITIONS = {
+    'address': {
+        'type': 'object',
+        'properties': {'zipcode': {'type': 'integer'}},
+    },
+}
+
+
+class FakeAsyncClient(object):
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+        self.closed = False
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        await asyncio.sleep(0)
+        route = self.routes[url]
+        if callable(route):
+            return await route()
+        return route
+
+    async def aclose(self):
+        self.closed = True
+
+    def urls(self):
+        return [url for method, url, kwargs in self.calls]
+
+
+class AsyncSessionTestCase(TestCase):
+
+    def setUp(self):
+        profile = 'application/json; profile=' + SCHEMA_URL
+        item = {'id': '1', 'address': {'zipcode': 123}}
+
+        self.client = FakeAsyncClient({
+            'http://example.com/items/1': FakeResponse(
+                'http://example.com/items/1', item,
+                headers={'content-type': profile}),
+            'http://example.com/items': FakeResponse(
+                'http://example.com/items', item,
+                headers={'content-type': profile}),
+            SCHEMA_URL: FakeResponse(SCHEMA_URL, SCHEMA),
+            DEFINITIONS_URL: FakeResponse(DEFINITIONS_URL, DEFINITIONS),
+            'http://example.com/missing': FakeResponse(
+                'http://example.com/missing', {}, status_code=404),
+        })
+        self.session = AsyncSession(client=self.client)
+
+    def run_async(self, coroutine):
+        # A new loop per test, as asyncio.run is not available on 3.6
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test_resource_loads_schema_and_references(self):
+        item = self.run_async(
+            self.session.resource('http://example.com/items/1'))
+
+        self.assertIsInstance(item, ObjectResource)
+        self.assertEqual(item['id'], '1')
+        self.assertEqual(
+            self.client.urls(),
+            ['http://example.com/items/1', SCHEMA_URL, DEFINITIONS_URL])
+
+        address = item.schema['properties']['address']
+        self.assertEqual(address['properties']['zipcode'],
+                         {'type': 'integer'})
+        self.assertTrue(item.is_valid())
+
+    def test_rel_is_awaitable(self):
+        async def navigate():
+            item = await self.session.resource('http://example.com/items/1')
+            return await item.rel('item')
+
+        related = self.run_async(navigate())
+        self.assertEqual(related.url, 'http://example.com/items/1')
+        self.assertEqual(self.client.urls().count(SCHEMA_URL), 1)
+
+    def test_rel_sends_data(self):
+        async def create():
+            item = await self.session.resource('http://example.com/items/1')
+            return await item.rel('create', data=item)
+
+        self.run_async(create())
+        method, url, kwargs = self.client.calls[-1]
+        self.assertEqual((method, url), ('post', 'http://example.com/items'))
+        self.assertEqual(json.loads(kwargs['data']),
+                         {'id': '1', 'address': {'zipcode': 123}})
+
+    def test_concurrent_navigations_fetch_schema_once(self):
+        async def navigate():
+            return await asyncio.gather(*[
+                self.session.resource('http://example.com/items/1')
+                for _ in range(10)])
+
+        items = self.run_async(navigate())
+        self.assertEqual(len(items), 10)
+        self.assertEqual(self.client.urls().count(SCHEMA_URL), 1)
+        self.assertEqual(self.client.urls().count(DEFINITIONS_URL), 1)
+
+    def test_resources_keeps_order(self):
+        urls = ['http://example.com/items', 'http://example.com/items/1']
+        items = self.run_async(self.session.resources(urls, max_workers=1))
+        self.assertEqual([item.url for item in items], urls)
+
+    def test_rel_many_yields_as_completed(self):
+        async def navigate():
+            item = await self.session.resource('http://example.com/items/1')
+            results = []
+            rels = [(item, 'item'), (item, 'create', {'data': {}})]
+            async for index, result in self.session.rel_many(
+                    rels, as_completed=True):
+                results.append((index, result.url))
+            return results
+
+        self.assertEqual(sorted(self.run_async(navigate())), [
+            (0, 'http://example.com/items/1'),
+            (1, 'http://example.com/items')])
+
+    def test_schema_loads_references(self):
+        schema = self.run_async(self.session.schema(SCHEMA_URL))
+        self.assertEqual(schema['links'], SCHEMA['links'])
+        self.assertEqual(self.client.urls(), [SCHEMA_URL, DEFINITIONS_URL])
+
+    def test_load_schema_shares_loaded_root(self):
+        async def load():
+            await self.session.load_schema(
+                LazySchema(SCHEMA_URL, session=self.session))
+            return await self.session.load_schema(
+                LazySchema(SCHEMA_URL + '#/links', session=self.session))
+
+        schema = self.run_async(load())
+        self.assertEqual(schema.data, SCHEMA['links'])
+        self.assertEqual(self.client.urls().count(SCHEMA_URL), 1)
+
+    def test_preload_loads_reference_closure(self):
+        report = self.run_async(self.session.preload(
+            [SCHEMA_URL, 'http://example.com/missing']))
+
+        self.assertEqual(sorted(report.loaded), [DEFINITIONS_URL, SCHEMA_URL])
+        self.assertEqual(list(report.failed), ['http://example.com/missing'])
+        self.assertEqual(self.client.urls().count(DEFINITIONS_URL), 1)
+
+        schema = LazySchema(SCHEMA_URL, session=self.session)
+        address = schema['properties']['address']
+        self.assertEqual(address['properties']['zipcode'],
+                         {'type': 'integer'})
+
+    def test_refresh_schema_keeps_schema_when_not_modified(self):
+        self.client.routes[SCHEMA_URL].headers = {'etag': '"v1"'}
+
+        async def refresh():
+            schema = await self.session.load_schema(
+                LazySchema(SCHEMA_URL, session=self.session))
+            raw_schema = schema.raw_schema
+
+            self.client.routes[SCHEMA_URL] = FakeResponse(
+                SCHEMA_URL, None, status_code=304, headers={})
+            changed = await self.session.refresh_schema(schema)
+            return changed, raw_schema is schema.raw_schema
+
+        self.assertEqual(self.run_async(refresh()), (False, True))
+        method, url, kwargs = self.client.calls[-1]
+        self.assertEqual(kwargs['headers']['if-none-match'], '"v1"')
+
+    def test_raises_for_error_responses(self):
+        with self.assertRaises(HTTPError):
+            self.run_async(self.session.resource('http://example.com/missing'))
+
+    def test_blocking_schema_access_raises(self):
+        schema = LazySchema(SCHEMA_URL, session=self.session)
+        with self.assertRaises(SchemaNotLoadedError):
+            schema.raw_schema
+
+    def test_closes_client(self):
+        async def use():
+            async with self.session:
+                pass
+
+        self.run_async(use())
+        self.assertTrue(self.client.closed)
+
+    def test_retries_with_session_policy(self):
+        responses = [
+            FakeResponse('http://example.com/flaky', {}, status_code=503),
+            FakeResponse('http://example.com/flaky', {'id': '1'}),
+        ]
+
+        async def flaky():
+            return responses.pop(0)
+
+        self.client.routes['http://example.com/flaky'] = flaky
+        self.session.retry = RetryPolicy(retries=1, backoff=0)
+
+        item = self.run_async(
+            self.session.resource('http://example.com/flaky'))
+        self.assertEqual(item, {'id': '1'})
+        self.assertEqual(self.session.retry.stats()['retries'], 1)
+
+    def test_rel_accepts_retry_policy(self):
+        policy = RetryPolicy(retries=0, hedge_after=0.01)
+        calls = []
+
+        async def slow_then_fast():
+            calls.append(None)
+            if len(calls) == 1:
+                await asyncio.sleep(5)
+            return self.client.routes['http://example.com/items']
+
+        async def navigate():
+            item = await self.session.resource('http://example.com/items/1')
+            self.client.routes['http://example.com/items/1'] = slow_then_fast
+            return await item.rel('item', retry=policy)
+
+        related = self.run_async(navigate())
+        self.assertEqual(related.url, 'http://example.com/items')
+        self.assertEqual(policy.stats()['hedge_wins'], 1)
+        self.assertNotIn('retry', self.client.calls[-1][2])
+
+    def test_rel_tags_request_events(self):
+        events = []
+        self.session.hooks.add(
+            'after_request', lambda event, info: events.append(info))
+
+        async def navigate():
+            item = await self.session.resource('http://example.com/items/1')
+            return await item.rel('item')
+
+        self.run_async(navigate())
+        self.assertEqual(events[-1]['rel'], 'item')
+        self.assertEqual(events[-1]['template'], '/items/{id}')
+
+    def test_requires_client_without_httpx(self):
+        with patch('pluct.aio.httpx', None):
+            with self.assertRaises(ImportError):
+                AsyncSession()
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import ujson
+import json
+
 import mock
+from requests import HTTPError
 
 
 class ServiceSchemaMock(mock.MagicMock):
@@ -9,7 +11,7 @@ class ServiceSchemaMock(mock.MagicMock):
         'content-type': 'application/json'
     }
     status_code = 200
-    content = ujson.dumps(
+    content = json.dumps(
         {
             'items': [
                 {
@@ -79,7 +81,7 @@ class ResourceSchemaMock(mock.MagicMock):
 
     @property
     def content(self):
-        return ujson.dumps(self.json)
+        return json.dumps(self.json)
 
 
 class ResourceItemsMock(mock.MagicMock):
@@ -87,7 +89,7 @@ class ResourceItemsMock(mock.MagicMock):
         'content-type': 'application/json'
     }
     status_code = 200
-    content = ujson.dumps(
+    content = json.dumps(
         {
             'items': [
                 {
@@ -105,3 +107,42 @@ class ResourceItemsMock(mock.MagicMock):
             ],
         }
     )
+
+
+class Clock(object):
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def fake_response(url='http://example.com/items/1', data=None, status=200,
+                  headers=None):
+    response = mock.Mock(url=url, status_code=status)
+    response.headers = headers if headers is not None else {}
+    response.json.return_value = data if data is not None else {'id': '1'}
+    if status >= 400:
+        response.raise_for_status.side_effect = HTTPError(response=response)
+    return response
+
+
+class FakeResponse(object):
+
+    def __init__(self, url, data, status_code=200, headers=None,
+                 profile=None):
+        self.url = url
+        self.status_code = status_code
+        self.encoding = 'utf-8'
+        self.content = json.dumps(data).encode('utf-8')
+        self.headers = headers or {'content-type': 'application/json'}
+        if profile is not None:
+            self.headers['content-type'] += '; profile=' + profile
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(self.status_code, response=self)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+# pluct.aio uses async/await, which is a syntax error before Python 3.6
+if sys.version_info >= (3, 6):
+    from pluct.tests.aio_cases import AsyncSessionTestCase  # noqa
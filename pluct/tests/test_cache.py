@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from copy import deepcopy
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from pluct.cache import SchemaCache
+from pluct.schema import LazySchema
+from pluct.session import Session
+
+
+RAW_SCHEMA = {
+    'title': 'app schema',
+    'properties': {
+        'pointer': {'$ref': '#/definitions/pointer'},
+    },
+    'definitions': {
+        'pointer': {'type': 'string'},
+    },
+}
+
+
+class BaseSchemaCacheTestCase(TestCase):
+
+    URL = 'http://example.com/schema'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'schemas.cache')
+
+        self.response = Mock(status_code=200, headers={'etag': '"v1"'})
+        self.response.json.side_effect = lambda: deepcopy(RAW_SCHEMA)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_cache(self):
+        return SchemaCache(self.path, autosave=False)
+
+    def create_session(self, cache):
+        session = Session(schema_cache=cache)
+        patch.object(session, 'request', return_value=self.response).start()
+        self.addCleanup(patch.stopall)
+        return session
+
+    def populate(self):
+        cache = self.create_cache()
+        session = self.create_session(cache)
+        LazySchema(self.URL, session=session).data
+        cache.save()
+        return cache
+
+
+class SchemaCacheTestCase(BaseSchemaCacheTestCase):
+
+    def test_starts_empty_without_file(self):
+        self.assertEqual(self.create_cache().entries, {})
+
+    def test_stores_pristine_raw_schema_with_validators(self):
+        cache = self.populate()
+        raw_schema, etag, last_modified, expires = cache.entries[self.URL]
+
+        self.assertEqual(raw_schema, RAW_SCHEMA)
+        self.assertEqual(etag, '"v1"')
+        self.assertIs(last_modified, None)
+        self.assertIs(expires, None)
+
+    def test_loads_saved_entries(self):
+        self.populate()
+        cache = self.create_cache()
+        self.assertEqual(cache.entries[self.URL],
+                         (RAW_SCHEMA, '"v1"', None, None))
+        self.assertFalse(cache.dirty)
+
+    def test_ignores_corrupted_file(self):
+        with open(self.path, 'wb') as cache_file:
+            cache_file.write(b'not a cache')
+        self.assertEqual(self.create_cache().entries, {})
+
+    def test_ignores_file_from_other_version(self):
+        with open(self.path, 'w') as cache_file:
+            json.dump({'version': 1,
+                       'entries': {self.URL: [RAW_SCHEMA, None, None, None]}},
+                      cache_file)
+        self.assertEqual(self.create_cache().entries, {})
+
+    def test_ignores_pickled_file(self):
+        with open(self.path, 'wb') as cache_file:
+            cache_file.write(
+                b'\x80\x04\x95\x05\x00\x00\x00\x00\x00\x00\x00K\x01.')
+        self.assertEqual(self.create_cache().entries, {})
+
+    def test_saves_json(self):
+        self.populate()
+        with open(self.path) as cache_file:
+            content = json.load(cache_file)
+        self.assertEqual(content['version'], SchemaCache.VERSION)
+        self.assertEqual(content['entries'][self.URL][0], RAW_SCHEMA)
+
+    def test_save_skips_clean_cache(self):
+        self.create_cache().save()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_session_accepts_cache_path(self):
+        session = Session(schema_cache=self.path)
+        self.assertIsInstance(session.schema_cache, SchemaCache)
+        self.assertEqual(session.schema_cache.path, self.path)
+
+
+class CachedLazySchemaTestCase(BaseSchemaCacheTestCase):
+
+    def setUp(self):
+        super(CachedLazySchemaTestCase, self).setUp()
+        self.populate()
+        self.response.json.reset_mock()
+
+        self.cache = self.create_cache()
+        self.session = self.create_session(self.cache)
+        self.request = self.session.request
+
+    def test_revalidates_restored_schema(self):
+        self.response.status_code = 304
+
+        schema = LazySchema(self.URL, session=self.session)
+        self.assertEqual(schema['title'], RAW_SCHEMA['title'])
+
+        self.request.assert_called_once_with(
+            self.URL, headers={'if-none-match': '"v1"'})
+        self.assertFalse(self.response.json.called)
+
+    def test_skips_request_for_fresh_schema(self):
+        raw_schema, etag, last_modified, expires = self.cache.entries[self.URL]
+        self.cache.entries[self.URL] = (
+            raw_schema, etag, last_modified, time.time() + 60)
+
+        schema = LazySchema(self.URL, session=self.session)
+        self.assertEqual(schema['title'], RAW_SCHEMA['title'])
+        self.assertFalse(self.request.called)
+
+    def test_reloads_modified_schema(self):
+        self.response.headers = {'etag': '"v2"'}
+        self.response.json.side_effect = lambda: {'title': 'new title'}
+
+        schema = LazySchema(self.URL, session=self.session)
+        self.assertEqual(schema['title'], 'new title')
+        self.assertEqual(self.cache.entries[self.URL][1], '"v2"')
+        self.assertTrue(self.cache.dirty)
+
+    def test_prewarms_session_store(self):
+        schemas = self.session.prewarm()
+
+        self.assertEqual([schema.href for schema in schemas],
+                         [self.URL + '#'])
+        self.assertIs(self.session.store.get(self.URL + '#'), schemas[0])
+        self.assertEqual(schemas[0]._raw_schema, RAW_SCHEMA)
+        self.assertFalse(self.request.called)
+
+    def test_restored_schema_does_not_change_cache_entry(self):
+        self.response.status_code = 304
+        LazySchema(self.URL, session=self.session)['properties']['pointer']
+        self.assertEqual(self.cache.entries[self.URL][0], RAW_SCHEMA)
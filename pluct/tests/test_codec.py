@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase, skipIf
+
+from mock import Mock, patch
+
+from pluct import codec
+from pluct.codec import JSONCodec, OrjsonCodec, get_codec
+
+
+class JSONCodecTestCase(TestCase):
+
+    def setUp(self):
+        self.codec = JSONCodec()
+
+    def test_loads_text_and_bytes(self):
+        self.assertEqual(self.codec.loads('{"a": 1}'), {'a': 1})
+        self.assertEqual(self.codec.loads(b'[1, 2]'), [1, 2])
+
+    def test_dumps(self):
+        self.assertEqual(self.codec.loads(self.codec.dumps({'a': [1]})),
+                         {'a': [1]})
+
+    def test_decodes_response_with_client(self):
+        response = Mock()
+        self.assertIs(self.codec.decode_response(response),
+                      response.json.return_value)
+
+
+@skipIf(codec.orjson is None, 'orjson is not installed')
+class OrjsonCodecTestCase(TestCase):
+
+    def setUp(self):
+        self.codec = OrjsonCodec()
+
+    def test_round_trip(self):
+        data = {'a': [1, 2.5, None, True], 'b': u'caf\xe9'}
+        self.assertEqual(self.codec.loads(self.codec.dumps(data)), data)
+
+    def test_decodes_response_content(self):
+        response = Mock(content=b'{"id": 1}')
+        self.assertEqual(self.codec.decode_response(response), {'id': 1})
+        self.assertFalse(response.json.called)
+
+    def test_raises_value_error_for_invalid_json(self):
+        with self.assertRaises(ValueError):
+            self.codec.decode_response(Mock(content=b''))
+
+
+class GetCodecTestCase(TestCase):
+
+    def test_defaults_to_stdlib(self):
+        self.assertIsInstance(get_codec(), JSONCodec)
+        self.assertIsInstance(get_codec('json'), JSONCodec)
+
+    def test_keeps_custom_codec(self):
+        custom = Mock()
+        self.assertIs(get_codec(custom), custom)
+
+    def test_raises_for_unknown_name(self):
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_orjson_requires_package(self):
+        with patch('pluct.codec.orjson', None):
+            with self.assertRaises(ImportError):
+                get_codec('orjson')
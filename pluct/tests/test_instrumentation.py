@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from mock import Mock
+
+from pluct.instrumentation import Histogram, Hooks, StatsCollector
+from pluct.schema import LazySchema
+from pluct.session import Session
+
+
+class HooksTestCase(TestCase):
+
+    def setUp(self):
+        self.hooks = Hooks()
+        self.events = []
+
+    def handler(self, event, info):
+        self.events.append((event, info))
+
+    def test_calls_handlers_of_event(self):
+        self.hooks.add('after_request', self.handler)
+        self.hooks.emit('after_request', url='/')
+        self.hooks.emit('before_request', url='/')
+        self.assertEqual(self.events, [('after_request', {'url': '/'})])
+
+    def test_calls_handlers_of_all_events(self):
+        self.hooks.add('*', self.handler)
+        self.hooks.emit('store_hit', href='/#')
+        self.hooks.emit('store_miss', href='/#')
+        self.assertEqual([event for event, info in self.events],
+                         ['store_hit', 'store_miss'])
+
+    def test_rejects_unknown_events(self):
+        with self.assertRaises(ValueError):
+            self.hooks.add('after_everything', self.handler)
+
+    def test_removes_handlers(self):
+        self.hooks.add('store_hit', self.handler)
+        self.hooks.remove('store_hit', self.handler)
+        self.hooks.emit('store_hit')
+        self.assertEqual(self.events, [])
+        self.assertFalse(self.hooks.enabled('store_hit'))
+
+    def test_adds_context_to_events(self):
+        self.hooks.add('*', self.handler)
+        with self.hooks.context(rel='next', template='/{page}'):
+            with self.hooks.context(rel='item'):
+                self.hooks.emit('after_request', url='/2')
+        self.hooks.emit('after_request', url='/3')
+
+        self.assertEqual(self.events, [
+            ('after_request', {
+                'url': '/2', 'rel': 'item', 'template': '/{page}'}),
+            ('after_request', {'url': '/3'}),
+        ])
+
+
+class HistogramTestCase(TestCase):
+
+    def test_summarizes_values(self):
+        histogram = Histogram()
+        for value in (0.0005, 0.003, 0.003, 0.04, 3.0):
+            histogram.add(value)
+
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.min, 0.0005)
+        self.assertEqual(histogram.max, 3.0)
+        self.assertAlmostEqual(histogram.mean(), 0.6093)
+
+    def test_percentiles_use_bucket_bounds(self):
+        histogram = Histogram()
+        for value in [0.0015] * 90 + [0.3] * 9 + [7.0]:
+            histogram.add(value)
+
+        self.assertEqual(histogram.percentile(50), 0.002)
+        self.assertEqual(histogram.percentile(90), 0.002)
+        self.assertEqual(histogram.percentile(99), 0.5)
+        self.assertEqual(histogram.percentile(100), 7.0)
+
+    def test_empty_histogram(self):
+        self.assertIsNone(Histogram().percentile(50))
+        self.assertIsNone(Histogram().mean())
+
+
+class SessionInstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        self.schema = {
+            'type': 'object',
+            'properties': {'id': {'type': 'string'}},
+            'links': [{'rel': 'item', 'href': '/items/{id}'}],
+        }
+        self.client = Mock()
+        self.client.request.side_effect = self.fake_request
+
+        self.session = Session(client=self.client)
+        self.stats = StatsCollector().attach(self.session)
+        self.events = []
+        self.session.hooks.add('*', lambda event, info: self.events.append(
+            (event, info)))
+
+    def fake_request(self, url, **kwargs):
+        response = Mock(url=url, status_code=200)
+        if url == '/schema':
+            response.headers = {'content-length': '120'}
+            response.json.return_value = self.schema
+        else:
+            response.headers = {
+                'content-type': 'application/json; profile=/schema',
+                'content-length': '11',
+            }
+            response.json.return_value = {'id': '1'}
+        return response
+
+    def event_names(self):
+        return [event for event, info in self.events]
+
+    def test_emits_request_events(self):
+        self.session.resource('/items/1')
+
+        self.assertEqual(self.event_names()[:3], [
+            'before_request', 'after_request', 'store_miss'])
+        event, info = self.events[1]
+        self.assertEqual(info['url'], '/items/1')
+        self.assertEqual(info['method'], 'get')
+        self.assertEqual(info['status'], 200)
+        self.assertEqual(info['size'], 11)
+        self.assertGreaterEqual(info['duration'], 0)
+
+    def test_emits_request_errors(self):
+        self.client.request.side_effect = IOError('down')
+        with self.assertRaises(IOError):
+            self.session.request('/items/1')
+
+        event, info = self.events[-1]
+        self.assertEqual(event, 'after_request')
+        self.assertIsInstance(info['error'], IOError)
+
+    def test_emits_schema_and_validation_events(self):
+        item = self.session.resource('/items/1')
+        self.assertTrue(item.is_valid())
+        item.schema['properties']
+
+        names = self.event_names()
+        for name in ('response_decoded', 'schema_fetched', 'schema_resolved',
+                     'validation_start', 'validation_end'):
+            self.assertIn(name, names)
+
+        fetched = self.events[names.index('schema_fetched')][1]
+        self.assertEqual((fetched['url'], fetched['source']),
+                         ('/schema', 'network'))
+        validated = self.events[names.index('validation_end')][1]
+        self.assertEqual(validated['schema'], '/schema#')
+        self.assertTrue(validated['valid'])
+
+    def test_emits_store_hits(self):
+        self.session.resource('/items/1')
+        self.events = []
+        LazySchema('/schema', session=self.session)
+        self.assertEqual(self.events, [('store_hit', {'href': '/schema#'})])
+
+    def test_collects_stats_per_rel_and_template(self):
+        item = self.session.resource('/items/1')
+        item.rel('item')
+        item.rel('item')
+
+        snapshot = self.stats.snapshot()
+        self.assertEqual(snapshot['counters']['after_request'], 4)
+        self.assertEqual(snapshot['sizes']['after_request'], 11 * 3 + 120)
+
+        requests = snapshot['latencies']['after_request']
+        self.assertEqual(requests['all']['count'], 4)
+        self.assertEqual(requests['rel']['item']['count'], 2)
+        self.assertEqual(requests['template']['/items/{id}']['count'], 2)
+        self.assertEqual(
+            self.stats.latency('after_request', rel='item').count, 2)
+
+    def test_detaches_stats(self):
+        self.stats.detach(self.session)
+        self.session.resource('/items/1')
+        self.assertEqual(self.stats.snapshot()['counters'], {})
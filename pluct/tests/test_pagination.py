@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from threading import Event
+from unittest import TestCase
+
+from mock import patch
+
+from pluct.pagination import iter_pages
+from pluct.resource import Resource
+from pluct.schema import Schema
+from pluct.session import Session
+
+
+class PaginationTestCase(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.schema = Schema('/schema', {
+            'links': [
+                {'rel': 'next', 'href': '/items/{next}'},
+                {'rel': 'previous', 'href': '/items/{previous}'},
+            ],
+        }, session=self.session)
+        self.fetched = []
+
+        patch.object(
+            self.session, 'resource', side_effect=self.fake_resource).start()
+        self.first = self.page(1)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def page(self, number, last=3):
+        data = {
+            'page': number,
+            'next': number + 1 if number < last else None,
+            'items': [{'id': '%d.%d' % (number, i)} for i in range(2)],
+        }
+        return Resource.from_data(
+            'http://example.com/items/%d' % number,
+            data=data, schema=self.schema, session=self.session)
+
+    def fake_resource(self, url, **kwargs):
+        self.fetched.append((url, kwargs))
+        return self.page(int(url.rsplit('/', 1)[1]))
+
+    def test_yields_items_across_pages(self):
+        items = list(self.first.paginate(member='items'))
+        self.assertEqual([item['id'] for item in items], [
+            '1.0', '1.1', '2.0', '2.1', '3.0', '3.1'])
+
+    def test_stops_when_link_cannot_be_expanded(self):
+        pages = list(self.first.pages())
+        self.assertEqual([page['page'] for page in pages], [1, 2, 3])
+        self.assertEqual(len(self.fetched), 2)
+
+    def test_stops_when_schema_has_no_link(self):
+        self.assertEqual(list(self.first.pages(rel='missing')), [self.first])
+
+    def test_follows_custom_rel(self):
+        self.first['previous'] = 2
+        pages = list(self.first.pages(rel='previous', prefetch=0))
+        self.assertEqual(len(pages), 2)
+
+    def test_passes_request_options(self):
+        list(self.first.pages(timeout=5))
+        self.assertEqual(self.fetched[0], (
+            'http://example.com/items/2', {'method': 'get', 'timeout': 5}))
+
+    def test_without_prefetch_fetches_on_demand(self):
+        pages = self.first.pages(prefetch=0)
+        next(pages)
+        self.assertEqual(self.fetched, [])
+        next(pages)
+        self.assertEqual(len(self.fetched), 1)
+
+    def test_prefetches_next_pages_in_background(self):
+        fetched = Event()
+
+        def fake_resource(url, **kwargs):
+            page = self.page(int(url.rsplit('/', 1)[1]), last=10)
+            self.fetched.append(url)
+            if len(self.fetched) == 2:
+                fetched.set()
+            return page
+
+        self.session.resource.side_effect = fake_resource
+        self.first = self.page(1, last=10)
+
+        pages = self.first.pages(prefetch=2)
+        next(pages)
+        self.assertTrue(fetched.wait(5))
+
+        # Never more than prefetch pages ahead of the consumer
+        self.assertEqual(len(self.fetched), 2)
+        self.assertEqual(next(pages)['page'], 2)
+        pages.close()
+
+    def test_raises_fetch_errors(self):
+        self.session.resource.side_effect = ValueError('boom')
+        pages = iter_pages(self.first)
+        self.assertIs(next(pages), self.first)
+        with self.assertRaises(ValueError):
+            next(pages)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from unittest import TestCase
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from mock import Mock
+
+from pluct.pool import PoolingAdapter, host_key
+from pluct.session import Session
+from pluct.tests.mocks import Clock
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class PoolTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        cls.url = 'http://127.0.0.1:%d/' % cls.server.server_address[1]
+        cls.host = cls.url.rstrip('/')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_sizes_pool_for_workers(self):
+        session = Session(max_workers=32, pool_connections=4)
+        adapter = session.client.adapters['http://']
+
+        self.assertIsInstance(adapter, PoolingAdapter)
+        self.assertIs(session.client.adapters['https://'], adapter)
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(adapter._pool_connections, 4)
+
+    def test_keeps_custom_client(self):
+        client = Mock()
+        session = Session(client=client)
+        self.assertIs(session.client, client)
+        self.assertFalse(client.mount.called)
+
+    def test_disables_keep_alive(self):
+        session = Session(keep_alive=False)
+        self.assertEqual(session.client.headers['connection'], 'close')
+
+    def test_reuses_connections(self):
+        session = Session()
+        session.request(self.url)
+        session.request(self.url)
+
+        stats = session.pool_stats()
+        self.assertEqual(stats['hosts'][self.host], {
+            'maxsize': 10, 'idle': 1, 'opened': 1, 'requests': 2})
+        self.assertEqual(stats['evictions'], 0)
+        session.close()
+
+    def test_evicts_idle_pools(self):
+        session = Session(idle_timeout=10)
+        adapter = session.client.adapters['http://']
+        adapter.clock = Clock()
+
+        session.request(self.url)
+        adapter.clock.now += 5
+        adapter.evict_idle()
+        self.assertIn(self.host, session.pool_stats()['hosts'])
+
+        adapter.clock.now += 10
+        adapter.evict_idle()
+        stats = session.pool_stats()
+        self.assertEqual(stats['hosts'], {})
+        self.assertEqual(stats['evictions'], 1)
+
+        session.request(self.url)
+        self.assertIn(self.host, session.pool_stats()['hosts'])
+
+    def test_host_key_uses_default_ports(self):
+        self.assertEqual(host_key('https://Example.com/a'),
+                         ('https', 'example.com', 443))
+        self.assertEqual(host_key('http://example.com:8080/'),
+                         ('http', 'example.com', 8080))
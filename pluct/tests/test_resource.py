@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import json
 from unittest import TestCase
-from jsonschema import RefResolver
 from mock import patch, Mock
 
 from pluct.resource import Resource, ObjectResource, ArrayResource
@@ -122,17 +122,22 @@ class ResourceTestCase(BaseTestCase):
     def test_resource_should_be_instance_of_schema(self):
         self.assertIsInstance(self.result, Resource)
 
-    def test_is_valid_call_validate_with_resolver_instance(self):
-        with patch('pluct.resources.validate') as mock_validate:
+    def test_is_valid_uses_session_validator(self):
+        with patch.object(self.session, 'validator') as mock_validator:
             self.result.is_valid()
-            self.assertTrue(mock_validate.called)
+            mock_validator.assert_called_once_with(self.schema)
+            mock_validator.return_value.is_valid.assert_called_once_with(
+                self.data)
 
-            resolver = mock_validate.call_args[-1]['resolver']
-            self.assertIsInstance(resolver, RefResolver)
+    def test_is_valid_reuses_compiled_validator(self):
+        self.assertTrue(self.result.is_valid())
+        validator = self.session.validators[self.schema.href]
+
+        with patch('pluct.session.validator_for') as mock_validator_for:
+            self.assertTrue(self.result.is_valid())
+            self.assertFalse(mock_validator_for.called)
 
-            http_handler, https_handler = list(resolver.handlers.values())
-            self.assertEqual(http_handler, self.result.session_request_json)
-            self.assertEqual(https_handler, self.result.session_request_json)
+        self.assertIs(self.session.validators[self.schema.href], validator)
 
     def test_session_request_json(self):
         mock_request_return = Mock()
@@ -233,6 +238,94 @@ class ParseResourceTestCase(BaseTestCase):
         self.assertEqual(values, data['values'])
 
 
+class ResourceChildrenTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ResourceChildrenTestCase, self).setUp()
+
+        self.raw_schema = {
+            'type': 'object',
+            'properties': {
+                'objects': {
+                    'type': 'array',
+                    'items': {'title': 'item'},
+                },
+                'meta': {'title': 'meta'},
+            },
+        }
+        self.schema = Schema(
+            href='url.com', raw_schema=self.raw_schema, session=self.session)
+        self.resource = self.resource_from_data(
+            url='appurl.com', schema=self.schema, data={
+                'objects': [{'id': 1}, {'id': 2}],
+                'meta': {},
+            })
+
+    def test_reuses_child_resources(self):
+        objects = self.resource['objects']
+        self.assertIs(self.resource['objects'], objects)
+        self.assertIs(self.resource['objects'][0], objects[0])
+
+    def test_reuses_item_schemas(self):
+        first = self.resource['objects'][0]
+        second = self.resource['objects'][1]
+        self.assertIs(first.schema, second.schema)
+        self.assertEqual(first.schema['title'], 'item')
+
+    def test_does_not_store_item_schemas_on_session(self):
+        self.resource['objects'][0]
+        self.assertEqual(list(self.session.store), ['url.com#'])
+
+    def test_item_schemas_depend_on_parent_schema(self):
+        other_schema = Schema(href='other.com', raw_schema={
+            'properties': {'meta': {'title': 'other meta'}},
+        }, session=self.session)
+        other = self.resource_from_data(
+            url='appurl.com', schema=other_schema, data={'meta': {}})
+
+        self.assertEqual(other['meta'].schema['title'], 'other meta')
+        self.assertEqual(self.resource['meta'].schema['title'], 'meta')
+
+    def test_setitem_replaces_child(self):
+        objects = self.resource['objects']
+        self.resource['objects'] = [{'id': 3}]
+
+        self.assertIsNot(self.resource['objects'], objects)
+        self.assertEqual(self.resource['objects'][0]['id'], 3)
+
+    def test_delitem_forgets_child(self):
+        self.resource['meta']
+        del self.resource['meta']
+
+        self.assertNotIn('meta', self.resource._children)
+        with self.assertRaises(KeyError):
+            self.resource['meta']
+
+    def test_detects_changes_on_data(self):
+        meta = self.resource['meta']
+        self.resource.data['meta'] = {'changed': True}
+        self.assertIsNot(self.resource['meta'], meta)
+        self.assertEqual(self.resource['meta']['changed'], True)
+
+    def test_array_changes_replace_children(self):
+        objects = self.resource['objects']
+        objects[0]
+
+        objects.insert(0, {'id': 0})
+        self.assertEqual(objects[0]['id'], 0)
+        self.assertEqual(objects[1]['id'], 1)
+
+        objects[1] = {'id': 5}
+        self.assertEqual(objects[1]['id'], 5)
+
+        del objects[0]
+        self.assertEqual(objects[0]['id'], 5)
+
+    def test_changes_on_empty_children_reach_parent(self):
+        self.resource['meta']['title'] = 'changed'
+        self.assertEqual(self.resource.data['meta'], {'title': 'changed'})
+
+
 class FromResponseTestCase(BaseTestCase):
 
     def setUp(self):
@@ -269,6 +362,17 @@ class FromResponseTestCase(BaseTestCase):
         self.assertEqual(returned_resource.response.headers,
                          self._response.headers)
 
+    def test_decodes_response_with_session_codec(self):
+        self.session.codec = Mock()
+        self.session.codec.decode_response.return_value = {'id': 1}
+
+        returned_resource = self.resource_from_response(
+            self._response, schema=self.schema)
+
+        self.assertEqual(returned_resource.data, {'id': 1})
+        self.session.codec.decode_response.assert_called_once_with(
+            self._response)
+
     def test_resource_with_an_array_without_schema(self):
         data = {
             'units': [
@@ -289,6 +393,72 @@ class FromResponseTestCase(BaseTestCase):
         self.assertDictEqual(data, response.data)
 
 
+class LazyFromResponseTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.session = Session(lazy=True)
+        self.response = Mock(url='http://example.com/items', headers={})
+        self.response.json.side_effect = self.decode
+
+    def decode(self):
+        return json.loads(self.response.content.decode('utf-8'))
+
+    def test_does_not_decode_until_data_is_read(self):
+        self.response.content = b'{"id": "1", "items": [1, 2]}'
+        resource = self.resource_from_response(self.response, schema=None)
+
+        self.assertIsInstance(resource, ObjectResource)
+        self.assertFalse(resource.is_decoded)
+        self.assertEqual(resource.headers, {})
+        self.assertFalse(self.response.json.called)
+
+        self.assertEqual(resource['id'], '1')
+        self.assertTrue(resource.is_decoded)
+        self.assertEqual(list(resource['items']), [1, 2])
+        self.assertEqual(self.response.json.call_count, 1)
+
+    def test_chooses_class_from_first_character(self):
+        self.response.content = b'  \n [{"id": "1"}]'
+        resource = self.resource_from_response(self.response, schema=None)
+
+        self.assertIsInstance(resource, ArrayResource)
+        self.assertEqual(len(resource), 1)
+        self.assertEqual(resource[0], {'id': '1'})
+
+    def test_decodes_scalars_eagerly(self):
+        self.response.content = b'"text"'
+        self.assertEqual(
+            self.resource_from_response(self.response, schema=None), 'text')
+
+    def test_invalid_content_decodes_to_default_data(self):
+        self.response.content = b'[1, 2'
+        resource = self.resource_from_response(self.response, schema=None)
+        self.assertEqual(resource.data, [])
+
+    def test_links_without_variables_skip_decoding(self):
+        self.response.content = b'{"id": "1"}'
+        schema = Schema('/schema', raw_schema={'links': [
+            {'rel': 'list', 'href': '/items'},
+            {'rel': 'item', 'href': '/items/{id}'},
+        ]}, session=self.session)
+        resource = self.resource_from_response(self.response, schema=schema)
+
+        self.assertEqual(resource.expand_uri('list'), '/items')
+        self.assertEqual(resource.expand_uri('item', id='2'), '/items/2')
+        self.assertFalse(resource.is_decoded)
+
+        self.assertEqual(resource.expand_uri('item'), '/items/1')
+        self.assertTrue(resource.is_decoded)
+
+    def test_setting_data_skips_decoding(self):
+        self.response.content = b'{"id": "1"}'
+        resource = self.resource_from_response(self.response, schema=None)
+
+        resource.data = {'id': '2'}
+        self.assertEqual(resource['id'], '2')
+        self.assertFalse(self.response.json.called)
+
+
 class ResourceFromDataTestCase(BaseTestCase):
 
     def test_should_create_array_resource_from_list(self):
@@ -306,3 +476,209 @@ class ResourceFromDataTestCase(BaseTestCase):
         self.assertIsInstance(resource, ObjectResource)
         self.assertEqual(resource.url, '/')
         self.assertEqual(resource.data, data)
+
+
+class CompactResourceTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(CompactResourceTestCase, self).setUp()
+        self.object = self.resource_from_data('/', data={'a': 1, 'b': [1]})
+        self.array = self.resource_from_data('/', data=[3, 1, 2])
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.object, '__dict__'))
+        self.assertFalse(hasattr(self.array, '__dict__'))
+
+    def test_keeps_builtin_types(self):
+        self.assertIsInstance(self.object, dict)
+        self.assertIsInstance(self.array, list)
+
+    def test_behaves_as_mapping(self):
+        self.assertEqual(len(self.object), 2)
+        self.assertEqual(sorted(self.object), ['a', 'b'])
+        self.assertIn('a', self.object)
+        self.assertEqual(self.object.get('a'), 1)
+        self.assertEqual(self.object.get('c', 0), 0)
+        self.assertEqual(dict(self.object), {'a': 1, 'b': [1]})
+        self.assertEqual(self.object | {'c': 2}, {'a': 1, 'b': [1], 'c': 2})
+
+        self.object.update(c=3)
+        self.assertEqual(self.object.pop('c'), 3)
+        self.assertEqual(self.object.data, {'a': 1, 'b': [1]})
+
+    def test_behaves_as_sequence(self):
+        self.assertEqual(len(self.array), 3)
+        self.assertEqual(list(self.array), [3, 1, 2])
+        self.assertEqual(self.array + [4], [3, 1, 2, 4])
+        self.assertEqual(self.array[1:], [1, 2])
+        self.assertEqual(self.array.index(1), 1)
+        self.assertTrue(self.array < [4])
+
+        self.array.append(0)
+        self.array.sort()
+        self.assertEqual(self.array.data, [0, 1, 2, 3])
+
+    def test_copies_resource(self):
+        copied = self.object.copy()
+        copied['a'] = 2
+
+        self.assertIsInstance(copied, ObjectResource)
+        self.assertEqual(self.object['a'], 1)
+        self.assertEqual(copied.url, self.object.url)
+        self.assertIs(copied.session, self.object.session)
+
+
+class IncrementalValidationTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(IncrementalValidationTestCase, self).setUp()
+
+        self.raw_schema = {
+            'type': 'object',
+            'required': ['name'],
+            'properties': {
+                'name': {'type': 'string'},
+                'address': {
+                    'type': 'object',
+                    'properties': {'zipcode': {'type': 'integer'}},
+                },
+                'tags': {'type': 'array', 'items': {'type': 'string'}},
+            },
+            'additionalProperties': {'type': 'integer'},
+        }
+        self.schema = Schema(
+            '/schema', raw_schema=self.raw_schema, session=self.session)
+        self.data = {
+            'name': 'repos',
+            'address': {'zipcode': 1},
+            'tags': ['a'],
+        }
+        self.resource = self.resource_from_data(
+            '/', data=self.data, schema=self.schema)
+        self.assertTrue(self.resource.is_valid())
+
+    def test_validates_current_data_by_default(self):
+        self.resource.data['name'] = 1
+        self.assertFalse(self.resource.is_valid())
+
+        self.resource.data['name'] = 'repos'
+        self.resource['address'].data['zipcode'] = 'invalid'
+        self.assertFalse(self.resource.is_valid())
+
+    def test_validates_only_changed_keys(self):
+        # Changes made on the raw data are not tracked
+        self.data['address']['zipcode'] = 'invalid'
+        self.resource['name'] = 'other'
+
+        self.assertTrue(self.resource.is_valid(incremental=True))
+        self.assertFalse(self.resource.is_valid())
+
+    def test_validates_changed_keys(self):
+        self.resource['name'] = 1
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+        self.resource['name'] = 'repos'
+        self.assertTrue(self.resource.is_valid(incremental=True))
+
+    def test_validates_additional_properties(self):
+        self.resource['count'] = 'many'
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_removed_keys(self):
+        del self.resource['name']
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_changes_of_children(self):
+        self.resource['address']['zipcode'] = 'invalid'
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_appended_items(self):
+        tags = self.resource['tags']
+        self.assertTrue(tags.is_valid(incremental=True))
+
+        self.data['tags'].append(1)
+        tags.append('b')
+        self.assertTrue(self.resource.is_valid(incremental=True))
+
+        self.resource['tags'].append(2)
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_moved_items(self):
+        self.resource['tags'].insert(0, 1)
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_replaced_data(self):
+        self.resource.data = {'name': 1}
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_whole_data_for_other_keywords(self):
+        self.raw_schema['allOf'] = [{'required': ['name']}]
+        self.data['address']['zipcode'] = 'invalid'
+        self.resource['name'] = 'other'
+
+        self.assertFalse(self.resource.is_valid(incremental=True))
+
+    def test_validates_children_with_their_schema(self):
+        address = self.resource['address']
+        self.assertTrue(address.is_valid(incremental=True))
+
+        address['zipcode'] = 'invalid'
+        self.assertFalse(address.is_valid(incremental=True))
+
+
+class UndeclaredMemberValidationTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(UndeclaredMemberValidationTestCase, self).setUp()
+        self.schema = Schema('/schema', raw_schema={
+            'type': 'object',
+            'properties': {
+                'items': {
+                    'type': 'array',
+                    'items': {'$ref': '#/definitions/item'},
+                },
+            },
+            'patternProperties': {
+                '^x-': {'type': 'object', 'required': ['id']},
+            },
+            'definitions': {
+                'item': {
+                    'type': 'object',
+                    'properties': {'id': {'type': 'integer'}},
+                    'additionalProperties': {'type': 'string'},
+                },
+            },
+        }, session=self.session)
+
+    def resource(self, data):
+        return self.resource_from_data('/', data=data, schema=self.schema)
+
+    def test_undeclared_members_are_valid(self):
+        resource = self.resource({'extra': {'a': 1}})
+        self.assertTrue(resource['extra'].is_valid())
+
+    def test_uses_pattern_properties(self):
+        resource = self.resource({'x-meta': {}})
+        self.assertFalse(resource['x-meta'].is_valid())
+        self.assertEqual(
+            resource['x-meta'].is_valid(), resource.is_valid())
+
+    def test_uses_additional_properties_through_references(self):
+        resource = self.resource({'items': [{'id': 1, 'extra': {}}]})
+        item = resource['items'][0]
+        self.assertFalse(item['extra'].is_valid())
+
+
+class ValidateItemsTestCase(BaseTestCase):
+
+    def test_validates_items_with_item_schema(self):
+        schema = Schema(
+            '/schema', raw_schema={'items': {'type': 'integer'}},
+            session=self.session)
+        resource = self.resource_from_data(
+            '/', data=[1, 'a', 3], schema=schema)
+
+        results = resource.validate_items()
+        self.assertEqual([result.valid for result in results],
+                         [True, False, True])
+        self.assertEqual(results[1].errors[0].path, '')
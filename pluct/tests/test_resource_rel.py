@@ -97,6 +97,17 @@ class ResourceRelTestCase(TestCase):
         uri = self.resource.expand_uri('related', related='foo')
         self.assertEqual(uri, '/root/slug/foo')
 
+    def test_expand_uri_prefers_params_over_data(self):
+        uri = self.resource.expand_uri('item', id='456')
+        self.assertEqual(uri, '/root/456')
+        self.assertEqual(self.resource.data['id'], '123')
+
+    def test_expand_uri_on_array_resource_uses_params(self):
+        resource = Resource.from_data(
+            'http://much.url.com/', data=[{'id': 1}], schema=self.schema,
+            session=self.session)
+        self.assertEqual(resource.expand_uri('item', id='7'), '/root/7')
+
     def test_has_rel_finds_existent_link(self):
         self.assertTrue(self.resource.has_rel('create'))
 
@@ -132,12 +143,38 @@ class ResourceRelTestCase(TestCase):
             headers={'content-type': 'application/json'}
         )
 
+    def test_encodes_data_with_session_codec(self):
+        self.session.codec = Mock()
+        self.session.codec.dumps.return_value = b'{"name": "Testing"}'
+
+        self.resource.rel('create', data={'name': 'Testing'})
+
+        self.session.codec.dumps.assert_called_once_with({'name': 'Testing'})
+        self.request.assert_called_with(
+            'http://much.url.com/root',
+            method='post',
+            data=b'{"name": "Testing"}',
+            headers={'content-type': 'application/json'}
+        )
+
     def test_uses_get_as_default_verb(self):
         self.resource.rel('list')
         self.request.assert_called_with(
             'http://much.url.com/root', method='get'
         )
 
+    def test_streams_related_collection(self):
+        self.response.encoding = 'utf-8'
+        self.response.iter_content.return_value = [
+            b'{"items": [{"id": 1},', b' {"id": 2}]}']
+        self.request.return_value = self.response
+
+        items = self.resource.rel('list', stream=True, member='items')
+
+        self.request.assert_called_with(
+            'http://much.url.com/root', method='get', stream=True)
+        self.assertEqual(list(items), [{'id': 1}, {'id': 2}])
+
     def test_expands_uri_using_resource_data(self):
         self.resource.rel('item')
         self.request.assert_called_with(
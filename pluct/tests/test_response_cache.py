@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from pluct.resource import ObjectResource
+from pluct.response_cache import ResponseCache, get_freshness_lifetime
+from pluct.session import Session
+from pluct.tests.mocks import Clock, fake_response
+
+
+class FreshnessLifetimeTestCase(TestCase):
+
+    def test_uses_max_age(self):
+        headers = {'cache-control': 'public, max-age=300'}
+        self.assertEqual(get_freshness_lifetime(headers, 0), 300)
+
+    def test_subtracts_age(self):
+        headers = {'cache-control': 'max-age=300', 'age': '100'}
+        self.assertEqual(get_freshness_lifetime(headers, 0), 200)
+
+    def test_uses_expires_from_date(self):
+        headers = {
+            'date': 'Tue, 15 Nov 1994 08:12:31 GMT',
+            'expires': 'Tue, 15 Nov 1994 08:17:31 GMT',
+        }
+        self.assertEqual(get_freshness_lifetime(headers, 0), 300)
+
+    def test_invalid_expires_is_stale(self):
+        headers = {'expires': '0'}
+        self.assertEqual(get_freshness_lifetime(headers, 0), 0)
+
+    def test_no_cache_must_revalidate(self):
+        headers = {'cache-control': 'no-cache', 'etag': '"v1"'}
+        self.assertEqual(get_freshness_lifetime(headers, 0), 0)
+
+    def test_validators_without_freshness_must_revalidate(self):
+        headers = {'last-modified': 'Tue, 15 Nov 1994 08:12:31 GMT'}
+        self.assertEqual(get_freshness_lifetime(headers, 0), 0)
+
+    def test_not_cacheable(self):
+        for headers in ({}, {'cache-control': 'no-store, max-age=60'},
+                        {'cache-control': 'max-age=60', 'vary': '*'}):
+            self.assertIsNone(get_freshness_lifetime(headers, 0))
+
+
+class ResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = ResponseCache(max_size=2, clock=self.clock)
+        self.headers = {'cache-control': 'max-age=60', 'content-length': '10'}
+
+    def store(self, key, **kwargs):
+        kwargs.setdefault('headers', self.headers)
+        return self.cache.store(key, fake_response(**kwargs), {'id': key})
+
+    def test_keys_include_sorted_params(self):
+        self.assertEqual(ResponseCache.key('/items', {'b': 2, 'a': 1}),
+                         '/items?a=1&b=2')
+        self.assertEqual(ResponseCache.key('/items?q=x', [('page', 2)]),
+                         '/items?q=x&page=2')
+        self.assertEqual(ResponseCache.key('/items'), '/items')
+
+    def test_entries_expire(self):
+        self.store('/a')
+        self.assertTrue(self.cache.is_fresh(self.cache.get('/a')))
+
+        self.clock.now += 61
+        self.assertFalse(self.cache.is_fresh(self.cache.get('/a')))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_does_not_store_uncacheable_responses(self):
+        self.store('/a')
+        self.assertIsNone(self.store('/a', headers={}))
+        self.assertIsNone(self.store('/b', status=206))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        self.store('/a')
+        self.store('/b')
+        self.cache.get('/a')
+        self.store('/c')
+
+        self.assertIn('/a', self.cache)
+        self.assertNotIn('/b', self.cache)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_bounds_bytes(self):
+        self.cache.max_size = None
+        self.cache.max_bytes = 25
+        for key in ('/a', '/b', '/c'):
+            self.store(key)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.stats()['bytes'], 20)
+
+    def test_keeps_body_and_decodes_copies(self):
+        response = fake_response(headers=self.headers)
+        response.content = b'{"id": "/a"}'
+        entry = self.cache.store('/a', response, {'id': 'decoded'})
+        self.assertEqual(entry.content, b'{"id": "/a"}')
+        self.assertIsNone(entry.data)
+
+        data = self.cache.data(entry)
+        data['id'] = 'changed'
+        self.assertEqual(self.cache.data(entry), {'id': '/a'})
+
+    def test_encodes_data_without_body(self):
+        entry = self.store('/a')
+        self.assertEqual(self.cache.data(entry), {'id': '/a'})
+        self.assertIsNot(self.cache.data(entry), self.cache.data(entry))
+
+    def test_shares_data_without_copy(self):
+        self.cache.copy = False
+        entry = self.store('/a')
+        self.assertIsNone(entry.content)
+        self.assertIs(self.cache.data(entry), self.cache.data(entry))
+
+    def test_revalidation_updates_freshness(self):
+        entry = self.store('/a')
+        self.clock.now += 61
+
+        self.cache.revalidated('/a', entry, fake_response(
+            status=304, headers={'cache-control': 'max-age=120'}))
+
+        self.assertTrue(self.cache.is_fresh(entry))
+        self.assertEqual(entry.headers['cache-control'], 'max-age=120')
+        self.assertEqual(self.cache.stats()['revalidations'], 1)
+
+
+class SessionResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = ResponseCache(clock=self.clock)
+        self.client = Mock(auth=None, headers={})
+        self.client.request.return_value = fake_response(headers={
+            'cache-control': 'max-age=60', 'etag': '"v1"'})
+        self.session = Session(client=self.client, response_cache=self.cache)
+
+    def test_fresh_hits_skip_request_and_decoding(self):
+        first = self.session.resource('http://example.com/items/1')
+        second = self.session.resource('http://example.com/items/1')
+
+        self.assertEqual(self.client.request.call_count, 1)
+        self.assertEqual(self.client.request.return_value.json.call_count, 1)
+        self.assertIsInstance(second, ObjectResource)
+        self.assertEqual(second, first)
+        self.assertIsNot(second.data, first.data)
+        self.assertEqual(second.url, 'http://example.com/items/1')
+
+    def test_lazy_hits_decode_when_read(self):
+        self.session.lazy = True
+        response = self.client.request.return_value
+        response.content = b'{"id": "1"}'
+        response.json.side_effect = lambda: json.loads(response.content)
+
+        self.session.resource('http://example.com/items/1')
+        item = self.session.resource('http://example.com/items/1')
+
+        self.assertIsInstance(item, ObjectResource)
+        self.assertFalse(item.is_decoded)
+        self.assertEqual(item['id'], '1')
+
+    def test_params_are_part_of_the_key(self):
+        self.session.resource('http://example.com/items', params={'q': 1})
+        self.session.resource('http://example.com/items', params={'q': 2})
+        self.assertEqual(self.client.request.call_count, 2)
+
+    def test_revalidates_stale_responses(self):
+        self.session.resource('http://example.com/items/1')
+        self.clock.now += 61
+
+        self.client.request.return_value = fake_response(
+            status=304, headers={'cache-control': 'max-age=60'})
+        item = self.session.resource('http://example.com/items/1')
+
+        self.assertEqual(item, {'id': '1'})
+        self.assertEqual(
+            self.client.request.call_args[1]['headers']['if-none-match'],
+            '"v1"')
+
+        self.session.resource('http://example.com/items/1')
+        self.assertEqual(self.client.request.call_count, 2)
+
+    def test_replaces_modified_responses(self):
+        self.session.resource('http://example.com/items/1')
+        self.clock.now += 61
+
+        self.client.request.return_value = fake_response(
+            data={'id': '2'}, headers={'cache-control': 'max-age=60'})
+        self.assertEqual(
+            self.session.resource('http://example.com/items/1'), {'id': '2'})
+        self.assertEqual(
+            self.session.resource('http://example.com/items/1'), {'id': '2'})
+
+    def test_unsafe_methods_invalidate(self):
+        self.session.resource('http://example.com/items/1')
+        self.session.resource('http://example.com/items/1', method='delete')
+        self.session.resource('http://example.com/items/1')
+
+        self.assertEqual(self.client.request.call_count, 3)
+        self.assertEqual(self.cache.stats()['hits'], 0)
+
+    def test_head_requests_bypass_cache(self):
+        self.client.request.return_value.json.return_value = {}
+        self.session.resource('http://example.com/items/1', method='head')
+        self.assertEqual(len(self.cache), 0)
+
+        self.client.request.return_value.json.return_value = {'id': '1'}
+        self.session.resource('http://example.com/items/1')
+        item = self.session.resource('http://example.com/items/1',
+                                     method='head')
+
+        self.assertEqual(self.client.request.call_count, 3)
+        self.assertEqual(
+            self.session.resource('http://example.com/items/1'), item)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_does_not_store_authorized_responses(self):
+        self.session.resource('http://example.com/items/1',
+                              headers={'Authorization': 'Bearer a'})
+        self.session.resource('http://example.com/items/1',
+                              headers={'Authorization': 'Bearer b'})
+        self.session.resource('http://example.com/items/1', auth=('a', 'b'))
+
+        self.assertEqual(self.client.request.call_count, 3)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_does_not_store_for_authorized_clients(self):
+        self.client.headers = {'Authorization': 'Bearer a'}
+        self.session.resource('http://example.com/items/1')
+        self.assertEqual(len(self.cache), 0)
+
+        self.client.headers = {}
+        self.client.auth = ('a', 'b')
+        self.session.resource('http://example.com/items/1')
+        self.assertEqual(len(self.cache), 0)
+
+    def test_stores_public_authorized_responses(self):
+        self.client.request.return_value.headers['cache-control'] = (
+            'public, max-age=60')
+        headers = {'Authorization': 'Bearer a'}
+        self.session.resource('http://example.com/items/1', headers=headers)
+        self.session.resource('http://example.com/items/1', headers=headers)
+        self.assertEqual(self.client.request.call_count, 1)
+
+    def test_does_not_store_private_responses(self):
+        self.client.request.return_value.headers['cache-control'] = (
+            'private, max-age=60')
+        self.session.resource('http://example.com/items/1')
+        self.session.resource('http://example.com/items/1')
+        self.assertEqual(self.client.request.call_count, 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_vary_headers_select_response(self):
+        self.client.request.return_value.headers['Vary'] = 'Accept-Language'
+        english = {'Accept-Language': 'en'}
+        self.session.resource('http://example.com/items/1', headers=english)
+
+        self.client.request.return_value = fake_response(
+            data={'id': '1', 'lang': 'pt'},
+            headers={'cache-control': 'max-age=60',
+                     'vary': 'Accept-Language'})
+        item = self.session.resource(
+            'http://example.com/items/1', headers={'accept-language': 'pt'})
+        self.assertEqual(item['lang'], 'pt')
+
+        item = self.session.resource(
+            'http://example.com/items/1', headers={'accept-language': 'pt'})
+        self.assertEqual(item['lang'], 'pt')
+        self.assertEqual(self.client.request.call_count, 2)
+
+    def test_keeps_profile_of_cached_responses(self):
+        self.client.request.return_value.headers['content-type'] = (
+            'application/json; profile=http://example.com/schema')
+
+        self.session.resource('http://example.com/items/1')
+        item = self.session.resource('http://example.com/items/1')
+
+        self.assertEqual(item.schema.url, 'http://example.com/schema')
+        self.assertEqual(self.client.request.call_count, 1)
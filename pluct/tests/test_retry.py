@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from unittest import TestCase
+
+from mock import Mock
+from requests.exceptions import ConnectionError, HTTPError
+
+from pluct.resource import Resource
+from pluct.retry import RetryPolicy
+from pluct.schema import Schema
+from pluct.session import Session
+from pluct.tests.mocks import fake_response
+
+
+class RetryPolicyTestCase(TestCase):
+
+    def setUp(self):
+        self.sleep = Mock()
+        self.policy = RetryPolicy(
+            retries=2, backoff=0.1, random=lambda: 0.5, sleep=self.sleep)
+        self.client = Mock()
+        self.session = Session(client=self.client, retry=self.policy)
+
+    def test_retries_connection_errors(self):
+        response = fake_response()
+        self.client.request.side_effect = [ConnectionError(), response]
+
+        self.assertIs(self.session.request('http://example.com'), response)
+        self.assertEqual(self.client.request.call_count, 2)
+        self.assertEqual(self.policy.stats()['retries'], 1)
+
+    def test_retries_server_errors_with_jittered_backoff(self):
+        failed = fake_response(status=503)
+        self.client.request.side_effect = [
+            failed, fake_response(status=502), fake_response()]
+
+        self.session.request('http://example.com')
+        self.assertEqual(
+            [call[0][0] for call in self.sleep.call_args_list], [0.05, 0.1])
+        failed.close.assert_called_once_with()
+
+    def test_gives_up_after_retries(self):
+        self.client.request.side_effect = ConnectionError()
+        with self.assertRaises(ConnectionError):
+            self.session.request('http://example.com')
+        self.assertEqual(self.client.request.call_count, 3)
+
+    def test_does_not_retry_client_errors(self):
+        self.client.request.return_value = fake_response(status=404)
+        with self.assertRaises(HTTPError):
+            self.session.request('http://example.com')
+        self.assertEqual(self.client.request.call_count, 1)
+
+    def test_does_not_retry_unsafe_methods(self):
+        self.client.request.side_effect = ConnectionError()
+        with self.assertRaises(ConnectionError):
+            self.session.request('http://example.com', method='post')
+        self.assertEqual(self.client.request.call_count, 1)
+        self.assertEqual(self.policy.stats()['requests'], 0)
+
+    def test_can_be_disabled_per_request(self):
+        self.client.request.side_effect = ConnectionError()
+        with self.assertRaises(ConnectionError):
+            self.session.request('http://example.com', retry=False)
+        self.assertEqual(self.client.request.call_count, 1)
+
+    def test_can_be_set_per_rel(self):
+        session = Session(client=self.client)
+        schema = Schema(
+            '/schema', raw_schema={'links': [{'rel': 'next', 'href': '/b'}]},
+            session=session)
+        resource = Resource.from_data(
+            'http://example.com/a', data={}, schema=schema, session=session)
+        self.client.request.side_effect = [ConnectionError(), fake_response()]
+
+        resource.rel('next', retry=self.policy)
+        self.assertEqual(self.client.request.call_count, 2)
+        self.assertNotIn('retry', self.client.request.call_args[1])
+
+
+class HedgingTestCase(TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(retries=0, hedge_after=0.01)
+        self.addCleanup(self.policy.close)
+        self.client = Mock()
+        self.session = Session(client=self.client, retry=self.policy)
+
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.slow = fake_response()
+        self.fast = fake_response()
+
+    def slow_then_fast(self, **kwargs):
+        if self.client.request.call_count == 1:
+            self.release.wait(5)
+            return self.slow
+        return self.fast
+
+    def fail_slowly(self, **kwargs):
+        response = self.slow_then_fast(**kwargs)
+        if response is self.slow:
+            raise ConnectionError()
+        return response
+
+    def test_uses_first_response(self):
+        self.client.request.side_effect = self.slow_then_fast
+
+        self.assertIs(self.session.request('http://example.com'), self.fast)
+        self.assertFalse(self.release.is_set())
+        self.assertEqual(self.policy.stats()['hedges'], 1)
+        self.assertEqual(self.policy.stats()['hedge_wins'], 1)
+
+    def test_closes_slower_response(self):
+        self.client.request.side_effect = self.slow_then_fast
+        self.session.request('http://example.com')
+
+        closed = threading.Event()
+        self.slow.close.side_effect = lambda: closed.set()
+        self.release.set()
+        self.assertTrue(closed.wait(5))
+        self.assertFalse(self.fast.close.called)
+
+    def test_uses_hedge_when_first_attempt_fails(self):
+        self.client.request.side_effect = self.fail_slowly
+        self.assertIs(self.session.request('http://example.com'), self.fast)
+
+    def test_first_attempts_do_not_wait_for_pool(self):
+        # A busy pool only delays hedges
+        self.policy.max_workers = 1
+        self.policy.hedge_after = 5
+        self.policy._get_executor().submit(self.release.wait, 5)
+        self.client.request.return_value = self.fast
+
+        self.assertIs(self.session.request('http://example.com'), self.fast)
+        self.assertFalse(self.release.is_set())
+
+    def test_raises_first_error_when_every_attempt_fails(self):
+        self.client.request.side_effect = ConnectionError()
+        self.policy.hedge_after = 0
+
+        with self.assertRaises(ConnectionError):
+            self.session.request('http://example.com')
+
+    def test_does_not_hedge_fast_requests(self):
+        self.policy.hedge_after = 5
+        self.client.request.return_value = self.fast
+        self.session.request('http://example.com')
+        self.assertEqual(self.policy.stats()['hedges'], 0)
+        self.assertIsNone(self.policy._executor)
+
+    def test_keeps_hooks_context(self):
+        self.client.request.side_effect = self.slow_then_fast
+        events = []
+        self.session.hooks.add(
+            'before_request', lambda event, info: events.append(info))
+
+        with self.session.hooks.context(rel='next'):
+            self.session.request('http://example.com')
+        self.assertEqual([info['rel'] for info in events], ['next', 'next'])
+
+    def test_session_close_stops_hedge_pool(self):
+        self.client.request.side_effect = self.slow_then_fast
+        self.session.request('http://example.com')
+        executor = self.policy._executor
+
+        self.session.close()
+        self.assertIsNone(self.policy._executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(len, [])
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import time
 from copy import deepcopy
+from threading import Thread
 from unittest import TestCase
 
+from jsonpointer import JsonPointerException
 from mock import Mock, patch
-from pluct.schema import get_profile_from_header, LazySchema, Schema
+from pluct.schema import (
+    get_max_age_from_header, get_profile_from_header, LazySchema, Schema)
 from pluct.session import Session
+from pluct.store import SchemaStore
 
 
 SCHEMA = {
@@ -58,7 +63,7 @@ class BaseLazySchemaTestCase(TestCase):
         self.schema = LazySchema(self.HREF, session=self.session)
 
         with patch.object(self.session, 'request') as self.request:
-            self.response = Mock()
+            self.response = Mock(status_code=200, headers={})
             self.response.json.return_value = deepcopy(self.RAW_SCHEMA)
             self.request.return_value = self.response
 
@@ -116,6 +121,92 @@ class LazySchemaTestCase(BaseLazySchemaTestCase):
         self.assertIs(self.session, self.schema.session)
 
 
+class LazySchemaSharedRootTestCase(BaseLazySchemaTestCase):
+
+    def test_pointer_reuses_loaded_root_schema(self):
+        self.schema.raw_schema
+        pointer = LazySchema(
+            self.HREF + '#/properties/name', session=self.session)
+
+        self.assertEqual(pointer, SCHEMA['properties']['name'])
+        self.request.assert_called_once_with('/schema')
+
+
+class LazySchemaRevalidationTestCase(BaseLazySchemaTestCase):
+
+    def setUp(self):
+        self.response.headers = {
+            'etag': '"v1"',
+            'last-modified': 'Tue, 15 Nov 1994 12:45:26 GMT',
+        }
+        self.schema.raw_schema
+        self.request.reset_mock()
+
+        self.not_modified = Mock(status_code=304, headers={})
+        self.request.return_value = self.not_modified
+
+    def test_keeps_loaded_schema_on_same_session(self):
+        schema = LazySchema(self.HREF, session=self.session)
+        self.assertIs(schema, self.schema)
+        self.assertEqual(schema.raw_schema['title'], SCHEMA['title'])
+        self.assertFalse(self.request.called)
+
+    def test_stores_validators_from_response(self):
+        self.assertEqual(self.schema.etag, '"v1"')
+        self.assertEqual(
+            self.schema.last_modified, 'Tue, 15 Nov 1994 12:45:26 GMT')
+        self.assertIs(self.schema.expires, None)
+
+    def test_refresh_sends_conditional_request(self):
+        self.schema.refresh()
+        self.request.assert_called_once_with('/schema', headers={
+            'if-none-match': '"v1"',
+            'if-modified-since': 'Tue, 15 Nov 1994 12:45:26 GMT',
+        })
+
+    def test_refresh_keeps_parsed_schema_when_not_modified(self):
+        raw_schema = self.schema.raw_schema
+        data = self.schema.data
+
+        self.assertFalse(self.schema.refresh())
+        self.assertIs(self.schema.raw_schema, raw_schema)
+        self.assertIs(self.schema.data, data)
+        self.assertFalse(self.not_modified.json.called)
+
+    def test_refresh_reloads_modified_schema(self):
+        modified = Mock(status_code=200, headers={'etag': '"v2"'})
+        modified.json.return_value = {'title': 'new title'}
+        self.request.return_value = modified
+
+        self.assertTrue(self.schema.refresh())
+        self.assertEqual(self.schema['title'], 'new title')
+        self.assertEqual(self.schema.etag, '"v2"')
+        self.assertIs(self.schema.last_modified, None)
+
+    def test_refresh_skips_request_while_fresh(self):
+        self.not_modified.headers = {'cache-control': 'max-age=60'}
+        self.schema.refresh(force=True)
+        self.request.reset_mock()
+
+        self.assertTrue(self.schema.is_fresh())
+        self.assertFalse(self.schema.refresh())
+        self.assertFalse(self.request.called)
+
+    def test_refresh_revalidates_after_max_age(self):
+        self.schema.expires = 1
+        self.assertFalse(self.schema.is_fresh())
+
+        self.schema.refresh()
+        self.assertTrue(self.request.called)
+
+    def test_refresh_loads_schema_not_loaded_yet(self):
+        schema = LazySchema('/other', session=self.session)
+        self.request.return_value = self.response
+
+        self.assertTrue(schema.refresh())
+        self.request.assert_called_once_with('/other')
+
+
 class CircularSchemaTestCase(TestCase):
 
     def test_uses_original_ref_on_representation(self):
@@ -175,6 +266,28 @@ class GetProfileFromHeaderTestCase(TestCase):
         self.assertEqual(url, self.SCHEMA_URL)
 
 
+class GetMaxAgeFromHeaderTestCase(TestCase):
+
+    def test_return_none_for_missing_cache_control(self):
+        self.assertIs(get_max_age_from_header({}), None)
+
+    def test_return_none_for_missing_max_age(self):
+        headers = {'cache-control': 'public'}
+        self.assertIs(get_max_age_from_header(headers), None)
+
+    def test_should_read_max_age(self):
+        headers = {'cache-control': 'public, max-age=300'}
+        self.assertEqual(get_max_age_from_header(headers), 300)
+
+    def test_return_zero_for_no_cache(self):
+        headers = {'cache-control': 'no-cache, max-age=300'}
+        self.assertEqual(get_max_age_from_header(headers), 0)
+
+    def test_return_none_for_invalid_max_age(self):
+        headers = {'cache-control': 'max-age=soon'}
+        self.assertIs(get_max_age_from_header(headers), None)
+
+
 class GetLinkTestCase(TestCase):
 
     def setUp(self):
@@ -191,6 +304,40 @@ class GetLinkTestCase(TestCase):
         link = self.schema.get_link('missing')
         self.assertIs(link, None)
 
+    def test_indexes_links_by_rel(self):
+        link = self.schema.link_index['create']
+        self.assertEqual(link.rel, 'create')
+        self.assertEqual(link.method, 'get')
+        self.assertEqual(link.href, '/api/content')
+        self.assertEqual(link.variables, set())
+        self.assertIs(link.link, self.schema['links'][0])
+
+    def test_parses_link_method_and_variables(self):
+        schema = Schema('/other', raw_schema={'links': [
+            {'rel': 'edit', 'href': '/api/{id}/{slug}', 'method': 'PUT'},
+            {'rel': 'edit', 'href': '/api/ignored'},
+        ]}, session=self.session)
+
+        link = schema.link_index['edit']
+        self.assertEqual(link.method, 'put')
+        self.assertEqual(link.href, '/api/{id}/{slug}')
+        self.assertEqual(link.variables, set(['id', 'slug']))
+
+    def test_reuses_index_while_links_are_the_same(self):
+        index = self.schema.link_index
+        self.assertIs(self.schema.link_index, index)
+
+    def test_rebuilds_index_when_schema_data_changes(self):
+        self.schema.link_index
+        self.schema._data = {'links': [{'rel': 'new', 'href': '/new'}]}
+
+        self.assertIs(self.schema.get_link('create'), None)
+        self.assertEqual(self.schema.get_link('new')['href'], '/new')
+
+    def test_empty_index_without_links(self):
+        schema = Schema('/other', raw_schema={}, session=self.session)
+        self.assertEqual(schema.link_index, {})
+
 
 class SchemaPointerTestCase(TestCase):
 
@@ -276,6 +423,92 @@ class SchemaPointerTestCase(TestCase):
         self.assertIsInstance(schema, Schema)
 
 
+class SchemaDocumentTestCase(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.href = 'http://example.org/schema#'
+        self.raw_schema = deepcopy(SCHEMA)
+        self.schema = Schema(
+            self.href, raw_schema=self.raw_schema, session=self.session)
+
+    def test_does_not_change_raw_schema(self):
+        self.schema['properties']['pointers']['items']['oneOf']
+        self.schema['properties']['self']['properties']
+        self.assertEqual(self.raw_schema, SCHEMA)
+
+    def test_shares_resolved_data_between_schemas(self):
+        pointers = Schema(
+            self.href + '/properties/pointers', raw_schema=self.raw_schema,
+            session=self.session)
+        self.assertIs(pointers.document, self.schema.document)
+        self.assertIs(pointers.data, self.schema['properties']['pointers'])
+
+    def test_shares_nodes_without_references(self):
+        self.assertIs(self.schema['properties']['name'],
+                      self.raw_schema['properties']['name'])
+
+    def test_follows_references_on_pointer(self):
+        repointer = Schema(
+            self.href + '/properties/repointer', raw_schema=self.raw_schema,
+            session=self.session)
+        self.assertIs(repointer.data, self.schema.document.resolve('/pointer'))
+
+    def test_resolves_recursive_references(self):
+        raw_schema = {
+            'properties': {
+                'name': {'type': 'string'},
+                'children': {'type': 'array', 'items': {'$ref': '#'}},
+            },
+        }
+        schema = Schema(
+            'http://example.org/tree', raw_schema=raw_schema,
+            session=self.session)
+
+        child = schema['properties']['children']['items']
+        grandchild = child['properties']['children']['items']
+        self.assertIs(grandchild, child)
+        self.assertIs(child['properties'], schema['properties'])
+        self.assertEqual(repr(child), repr(raw_schema))
+
+    def test_keeps_circular_references(self):
+        raw_schema = {'a': {'$ref': '#/b'}, 'b': {'$ref': '#/a'}}
+        schema = Schema(
+            'http://example.org/circular#/a', raw_schema=raw_schema,
+            session=self.session)
+        self.assertEqual(schema.data, {'$ref': '#/a'})
+
+    def test_raw_node_points_into_references(self):
+        document = self.schema.document
+        self.assertIs(document.raw_node('/properties/name'),
+                      self.raw_schema['properties']['name'])
+        self.assertEqual(
+            document.raw_node('/properties/external/properties/a~1b'),
+            {'$ref': 'http://example.com/schema#/pointer/properties/a~1b'})
+        self.assertEqual(document.raw_node('/properties/self/title'),
+                         {'$ref': '#/title'})
+
+    def test_raw_node_derives_undeclared_members(self):
+        document = Schema('http://example.org/open', raw_schema={
+            'properties': {'a': {'type': 'string'}},
+            'patternProperties': {'^x': {'minimum': 1}},
+            'additionalProperties': {'type': 'integer'},
+        }, session=self.session).document
+
+        self.assertEqual(document.raw_node('/properties/b'),
+                         {'type': 'integer'})
+        self.assertEqual(document.raw_node('/properties/x'),
+                         {'minimum': 1})
+        self.assertEqual(document.raw_node('/properties/b/items'), {})
+
+    def test_raises_for_missing_pointer(self):
+        schema = Schema(
+            self.href + '/properties/missing', raw_schema=self.raw_schema,
+            session=self.session)
+        with self.assertRaises(JsonPointerException):
+            schema.data
+
+
 class LazySchemaPointerTestCase(BaseLazySchemaTestCase):
 
     HREF = '/schema#/properties/name'
@@ -317,6 +550,17 @@ class SchemaStoreMixinTestCase(object):
         self.assertIsNot(schema1, schema2)
 
 
+class BoundedSchemaStoreTestCase(TestCase):
+
+    def test_recreates_evicted_schemas(self):
+        session = Session(store=SchemaStore(max_size=1))
+        schema = Schema('/a', raw_schema={}, session=session)
+        Schema('/b', raw_schema={}, session=session)
+
+        self.assertIsNot(Schema('/a', raw_schema={}, session=session), schema)
+        self.assertEqual(session.store.evictions, 2)
+
+
 class SchemaStoreTestCase(SchemaStoreMixinTestCase, TestCase):
 
     def create_schema(self, url, session=None):
@@ -331,3 +575,50 @@ class LazySchemaStoreTestCase(SchemaStoreMixinTestCase, TestCase):
         if session is None:
             session = self.session
         return LazySchema(self.SCHEMA_URL, session=session)
+
+
+class SlowStore(SchemaStore):
+
+    def get(self, href, default=None):
+        schema = SchemaStore.get(self, href, default)
+        # Lets every thread miss before any of them stores the schema
+        time.sleep(0.01)
+        return schema
+
+
+class ConcurrentSchemaTestCase(TestCase):
+
+    def run_threads(self, target, count=4):
+        results = []
+        threads = [
+            Thread(target=lambda: results.append(target()))
+            for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_share_one_schema(self):
+        session = Session(store=SlowStore())
+        results = self.run_threads(
+            lambda: LazySchema('http://example.com/schema', session=session))
+
+        self.assertEqual(len(set(id(schema) for schema in results)), 1)
+        self.assertIs(results[0], session.store['http://example.com/schema#'])
+
+    def test_concurrent_resolution_publishes_one_data(self):
+        session = Session()
+        schema = Schema(
+            'http://example.com/schema', raw_schema=deepcopy(SCHEMA),
+            session=session)
+        document = schema.document
+        expand = document.expand
+
+        def slow_expand(node):
+            time.sleep(0.001)
+            return expand(node)
+
+        with patch.object(document, 'expand', side_effect=slow_expand):
+            results = self.run_threads(lambda: schema['properties'])
+        self.assertEqual(len(set(id(data) for data in results)), 1)
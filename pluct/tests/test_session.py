@@ -1,10 +1,21 @@
 # -*- coding: utf-8 -*-
 
+import json
+import sys
+import time
+from threading import Event, Lock, Thread
 from unittest import TestCase
 
+from jsonschema import RefResolver, SchemaError
+
 from mock import ANY, Mock, patch
 
+from pluct.codec import JSONCodec
+from pluct.resource import ObjectResource
+from pluct.schema import Schema
 from pluct.session import Session
+from pluct.store import SchemaStore
+from pluct.tests.mocks import FakeResponse
 
 
 class SessionInitializationTestCase(TestCase):
@@ -18,6 +29,32 @@ class SessionInitializationTestCase(TestCase):
             Session()
             client.assert_called_with()
 
+    def test_uses_schema_store_as_default_store(self):
+        session = Session()
+        self.assertIsInstance(session.store, SchemaStore)
+
+    def test_allows_custom_store(self):
+        store = {}
+        session = Session(store=store)
+        self.assertIs(session.store, store)
+
+    def test_decodes_eagerly_by_default(self):
+        self.assertFalse(Session().lazy)
+        self.assertTrue(Session(lazy=True).lazy)
+
+    def test_uses_stdlib_codec_as_default(self):
+        self.assertIsInstance(Session().codec, JSONCodec)
+
+    def test_allows_custom_codec(self):
+        codec = Mock()
+        session = Session(codec=codec)
+
+        with patch.object(session, 'request') as request:
+            self.assertIs(session.request_json('/'),
+                          codec.decode_response.return_value)
+            codec.decode_response.assert_called_once_with(
+                request.return_value)
+
     def test_allows_custom_client(self):
         custom_client = Mock()
         session = Session(client=custom_client)
@@ -107,3 +144,464 @@ class SessionResourceTestCase(TestCase):
         self.session.schema('/')
         Schema.assert_called_with(
             '/', raw_schema=self.response.json(), session=self.session)
+
+
+class SessionStreamingTestCase(TestCase):
+
+    def setUp(self):
+        self.schema = {
+            'type': 'object',
+            'properties': {
+                'items': {'type': 'array', 'items': {
+                    'type': 'object',
+                    'links': [{'rel': 'self', 'href': '/items/{id}'}],
+                }},
+            },
+            'items': {'type': 'object', 'required': ['id']},
+        }
+        schema_response = Mock(headers={})
+        schema_response.json.return_value = self.schema
+
+        self.response = Mock(url='http://example.com/items', encoding=None)
+        self.response.headers = {
+            'content-type': 'application/json; profile=/schema'}
+
+        self.client = Mock()
+        self.client.request.side_effect = (
+            lambda url, **kwargs:
+            schema_response if url == '/schema' else self.response)
+        self.session = Session(client=self.client)
+
+    def stream(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.response.iter_content.return_value = [
+            body[i:i + 7] for i in range(0, len(body), 7)]
+
+    def test_streams_top_level_array(self):
+        self.stream([{'id': 1}, {'id': 2}])
+
+        items = self.session.resource('/items', stream=True)
+        self.client.request.assert_called_once_with(
+            url='/items', method='get', stream=True, headers=ANY)
+
+        items = list(items)
+        self.assertEqual(items, [{'id': 1}, {'id': 2}])
+        self.assertIsInstance(items[0], ObjectResource)
+        self.assertEqual(items[0].url, 'http://example.com/items')
+        self.assertEqual(items[0].schema.pointer, '/items')
+        self.assertTrue(items[0].is_valid())
+        self.response.close.assert_called_once_with()
+
+    def test_streams_array_member(self):
+        self.stream({'count': 2, 'items': [{'id': 1}, {'id': 2}]})
+
+        items = list(self.session.resource(
+            '/items', stream=True, member='items'))
+
+        self.assertEqual(items, [{'id': 1}, {'id': 2}])
+        self.assertEqual(
+            items[0].schema.pointer, '/properties/items/items')
+        self.assertEqual(items[0].expand_uri('self'), '/items/1')
+
+    def test_closes_response_when_not_consumed(self):
+        self.stream([{'id': 1}, {'id': 2}])
+
+        items = self.session.resource('/items', stream=True)
+        next(items)
+        items.close()
+        self.response.close.assert_called_once_with()
+
+    def test_streams_without_schema(self):
+        self.response.headers = {}
+        self.stream([{'id': 1}, 2])
+
+        items = list(self.session.resource_items('/items', chunk_size=16))
+
+        self.assertIsNone(items[0].schema)
+        self.assertEqual(items[1], 2)
+        self.response.iter_content.assert_called_once_with(chunk_size=16)
+
+
+class SessionPreloadTestCase(TestCase):
+
+    def setUp(self):
+        self.schemas = {
+            'http://example.com/a': {
+                'properties': {
+                    'b': {'$ref': 'http://example.com/b#/definitions/b'},
+                    'c': {'$ref': 'http://example.com/c'},
+                },
+            },
+            'http://example.com/b': {
+                'definitions': {'b': {'$ref': 'http://example.com/d'}},
+            },
+            'http://example.com/c': {'type': 'string'},
+            'http://example.com/d': {'items': {'$ref': '#/definitions/x'}},
+        }
+        self.client = Mock()
+        self.client.request.side_effect = self.fake_request
+        self.session = Session(client=self.client, max_workers=2)
+
+    def fake_request(self, url, **kwargs):
+        response = Mock(headers={})
+        if url not in self.schemas:
+            response.raise_for_status.side_effect = ValueError(url)
+        response.json.return_value = self.schemas.get(url)
+        return response
+
+    def urls(self):
+        return sorted(
+            kwargs['url'] for args, kwargs in
+            self.client.request.call_args_list)
+
+    def test_loads_reference_closure(self):
+        report = self.session.preload(['http://example.com/a#/properties'])
+
+        self.assertEqual(sorted(report.loaded), sorted(self.schemas))
+        self.assertEqual(report.failed, {})
+        self.assertGreaterEqual(report.elapsed, 0)
+        self.assertEqual(self.urls(), sorted(self.schemas))
+
+    def test_resolves_schemas_into_store(self):
+        self.session.preload(['http://example.com/a'])
+        self.client.request.reset_mock()
+
+        schema = self.session.store['http://example.com/a#']
+        self.assertIn('items', schema['properties']['b'])
+        self.assertEqual(schema['properties']['c'], {'type': 'string'})
+        self.assertFalse(self.client.request.called)
+
+    def test_reports_failures(self):
+        self.schemas['http://example.com/c'] = {
+            '$ref': 'http://example.com/missing'}
+
+        report = self.session.preload(['http://example.com/a'])
+
+        self.assertEqual(list(report.failed), ['http://example.com/missing'])
+        self.assertIsInstance(
+            report.failed['http://example.com/missing'], ValueError)
+        self.assertEqual(len(report.loaded), 4)
+
+    def test_skips_loaded_schemas(self):
+        self.session.preload(['http://example.com/c'])
+        report = self.session.preload(['http://example.com/c'])
+
+        self.assertEqual(list(report.loaded), ['http://example.com/c'])
+        self.assertEqual(self.urls(), ['http://example.com/c'])
+
+
+class SessionValidatorTestCase(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.raw_schema = {
+            'type': 'object',
+            'properties': {'name': {'type': 'string'}},
+        }
+        self.schema = Schema(
+            '/schema', raw_schema=self.raw_schema, session=self.session)
+
+    def test_compiles_validator_for_schema(self):
+        validator = self.session.validator(self.schema)
+        self.assertIs(validator.schema, self.raw_schema)
+        self.assertTrue(validator.is_valid({'name': 'pluct'}))
+        self.assertFalse(validator.is_valid({'name': 1}))
+
+    def test_caches_validator_by_href(self):
+        validator = self.session.validator(self.schema)
+        self.assertIs(self.session.validator(self.schema), validator)
+        self.assertIs(self.session.validators['/schema#'], validator)
+
+    def test_recompiles_validator_when_raw_schema_changes(self):
+        validator = self.session.validator(self.schema)
+        self.schema._raw_schema = {'type': 'string'}
+
+        new_validator = self.session.validator(self.schema)
+        self.assertIsNot(new_validator, validator)
+        self.assertIs(new_validator.schema, self.schema.raw_schema)
+
+    def test_caches_sub_schema_validators_by_document(self):
+        other = Schema('/other', raw_schema={
+            'type': 'object',
+            'properties': {'name': {'type': 'integer'}},
+        }, session=self.session)
+        names = [self.schema.sub_schema('/properties/name'),
+                 other.sub_schema('/properties/name')]
+        validators = [self.session.validator(name) for name in names]
+
+        with patch('pluct.session.sub_validator') as mock_sub_validator:
+            for name, validator in zip(names, validators):
+                self.assertIs(self.session.validator(name), validator)
+            self.assertFalse(mock_sub_validator.called)
+
+        self.assertTrue(validators[0].is_valid('pluct'))
+        self.assertTrue(validators[1].is_valid(1))
+        self.assertIs(
+            self.session.validators['/other#/properties/name'], validators[1])
+
+    def test_uses_resolver_with_session_handlers(self):
+        resolver = self.session.validator(self.schema).resolver
+        self.assertIsInstance(resolver, RefResolver)
+        self.assertEqual(resolver.handlers['http'], self.session.request_json)
+        self.assertEqual(
+            resolver.handlers['https'], self.session.request_json)
+
+    def test_checks_schema_before_caching(self):
+        self.schema._raw_schema = {'type': 1}
+        with self.assertRaises(SchemaError):
+            self.session.validator(self.schema)
+        self.assertNotIn('/schema#', self.session.validators)
+
+    def test_request_json(self):
+        with patch.object(self.session, 'request') as request:
+            self.assertIs(
+                self.session.request_json('/'),
+                request.return_value.json.return_value)
+            request.assert_called_once_with('/')
+
+
+class SessionValidateManyTestCase(TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.raw_schema = {
+            'type': 'object',
+            'properties': {
+                'name': {'type': 'string'},
+                'address': {'$ref': 'http://example.com/definitions#/address'},
+            },
+        }
+        self.schema = Schema(
+            'http://example.com/schema', raw_schema=self.raw_schema,
+            session=self.session)
+        self.items = [
+            {'name': 'a', 'address': {'zipcode': 1}},
+            {'name': 1, 'address': {'zipcode': 'x'}},
+            {'name': 'c'},
+        ]
+
+        response = Mock(headers={})
+        response.json.return_value = {
+            'address': {'properties': {'zipcode': {'type': 'integer'}}}}
+        patcher = patch.object(
+            self.session, 'request', return_value=response)
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def resources(self):
+        return [
+            ObjectResource('/items/%d' % index, data=data,
+                           schema=self.schema, session=self.session)
+            for index, data in enumerate(self.items)]
+
+    def assertResults(self, results):
+        self.assertEqual([result.valid for result in results],
+                         [True, False, True])
+        self.assertEqual(
+            sorted(results[1].errors),
+            [('/address/zipcode', "'x' is not of type 'integer'"),
+             ('/name', "1 is not of type 'string'")])
+
+    def test_validates_on_calling_process(self):
+        with patch('pluct.session.ProcessPoolExecutor') as executor:
+            results = self.session.validate_many(self.resources())
+        self.assertResults(results)
+        self.assertFalse(executor.called)
+
+    def test_validates_large_batches_on_processes(self):
+        results = self.session.validate_many(
+            self.resources(), processes=2, parallel_threshold=2)
+        self.assertResults(results)
+        self.request.assert_called_once_with(
+            'http://example.com/definitions')
+
+    def test_keeps_order_of_mixed_schemas(self):
+        other = Schema(
+            'http://example.com/other', raw_schema={'type': 'array'},
+            session=self.session)
+        resources = self.resources()
+        resources.insert(1, ObjectResource(
+            '/other', data={}, schema=other, session=self.session))
+
+        results = self.session.validate_many(resources)
+        self.assertEqual([result.valid for result in results],
+                         [True, False, False, True])
+
+    def test_checks_schema_first(self):
+        self.schema._raw_schema = {'type': 1}
+        with self.assertRaises(SchemaError):
+            self.session.validate_many(self.resources())
+
+
+class SessionBatchTestCase(TestCase):
+
+    def setUp(self):
+        self.session = Session(max_workers=4)
+        self.running = 0
+        self.max_running = 0
+        self.lock = Lock()
+
+        patch.object(
+            self.session, 'resource', side_effect=self.fake_resource).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_resource(self, url, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01 if url != '/0' else 0.05)
+        with self.lock:
+            self.running -= 1
+
+        if url == '/error':
+            raise ValueError(url)
+        return url, kwargs
+
+    def test_resources_keeps_order(self):
+        urls = ['/%d' % i for i in range(8)]
+        results = self.session.resources(urls, timeout=1)
+        self.assertEqual(results, [(url, {'timeout': 1}) for url in urls])
+
+    def test_resources_runs_concurrently_up_to_max_workers(self):
+        self.session.resources(['/%d' % i for i in range(12)])
+        self.assertGreater(self.max_running, 1)
+        self.assertLessEqual(self.max_running, 4)
+
+    def test_resources_accepts_max_workers(self):
+        self.session.resources(['/%d' % i for i in range(4)], max_workers=1)
+        self.assertEqual(self.max_running, 1)
+
+    def test_resources_raises_first_error(self):
+        with self.assertRaises(ValueError):
+            self.session.resources(['/1', '/error', '/2'])
+
+    def test_resources_yields_as_completed(self):
+        urls = ['/0', '/1', '/2']
+        results = list(self.session.resources(urls, as_completed=True))
+
+        self.assertEqual(sorted(results), [
+            (0, ('/0', {})), (1, ('/1', {})), (2, ('/2', {}))])
+        self.assertEqual(results[-1][0], 0)
+
+    def test_rel_many_follows_links(self):
+        first, second = Mock(), Mock()
+        results = self.session.rel_many([
+            (first, 'item'),
+            (second, 'search', {'params': {'q': 'foo'}}),
+        ])
+
+        first.rel.assert_called_once_with('item')
+        second.rel.assert_called_once_with('search', params={'q': 'foo'})
+        self.assertEqual(
+            results, [first.rel.return_value, second.rel.return_value])
+
+    def test_run_many_handles_empty_calls(self):
+        self.assertEqual(self.session.run_many([]), [])
+
+
+class FakeClient(object):
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = {}
+        self.lock = Lock()
+
+    def request(self, url, **kwargs):
+        with self.lock:
+            self.calls[url] = self.calls.get(url, 0) + 1
+        # Gives other threads the chance to run in the middle of requests
+        time.sleep(0.001)
+        data, profile = self.routes[url]
+        return FakeResponse(url, data, profile=profile)
+
+
+class SessionThreadSafetyTestCase(TestCase):
+
+    SCHEMA = 'http://example.com/schema'
+
+    def setUp(self):
+        self.raw_schema = {
+            'type': 'object',
+            'properties': {
+                'id': {'type': 'integer'},
+                'address': {
+                    '$ref': 'http://example.com/definitions#/address'},
+                'children': {'type': 'array', 'items': {'$ref': '#'}},
+            },
+            'links': [{'rel': 'self', 'href': '/items/{id}'}],
+        }
+        routes = {
+            self.SCHEMA: (self.raw_schema, None),
+            'http://example.com/definitions': ({
+                'address': {
+                    'type': 'object',
+                    'properties': {'zipcode': {'type': 'integer'}},
+                },
+            }, None),
+        }
+        for index in range(10):
+            routes['http://example.com/items/%d' % index] = ({
+                'id': index,
+                'address': {'zipcode': index},
+                'children': [{'id': index * 10}],
+            }, self.SCHEMA)
+
+        self.client = FakeClient(routes)
+        self.session = Session(client=self.client)
+
+        # Switches threads more often, to make races more likely
+        if hasattr(sys, 'setswitchinterval'):
+            interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+            self.addCleanup(sys.setswitchinterval, interval)
+
+    def navigate(self, index):
+        item = self.session.resource('http://example.com/items/%d' % index)
+        schema = item.schema
+
+        address = schema['properties']['address']
+        child = schema['properties']['children']['items']
+        assert address['properties']['zipcode'] == {'type': 'integer'}
+        assert child['properties'] is schema['properties']
+        assert item.has_rel('self')
+        assert item['children'][0].is_valid()
+        assert item.is_valid()
+        return schema, schema.data, address.data
+
+    def test_shares_one_session_between_threads(self):
+        errors = []
+        seen = []
+        lock = Lock()
+        start = Event()
+
+        def worker(number):
+            start.wait()
+            try:
+                for index in range(20):
+                    result = self.navigate((number + index) % 10)
+                    with lock:
+                        seen.append(result)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [Thread(target=worker, args=(number,))
+                   for number in range(16)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(seen), 320)
+
+        # One stored schema, resolved data published once
+        for position in range(3):
+            ids = set(id(result[position]) for result in seen)
+            self.assertEqual(len(ids), 1)
+
+        self.assertEqual(self.client.calls[self.SCHEMA], 1)
+        self.assertEqual(self.raw_schema['properties']['children'],
+                         {'type': 'array', 'items': {'$ref': '#'}})
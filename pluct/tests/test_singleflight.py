@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Event, Thread
+from unittest import TestCase
+
+from mock import Mock
+
+from pluct.schema import LazySchema
+from pluct.session import Session
+from pluct.singleflight import SingleFlight
+
+
+class BaseSingleFlightTestCase(TestCase):
+
+    WAITERS = 5
+
+    def setUp(self):
+        self.release = Event()
+        self.started = Event()
+        self.calls = []
+
+    def blocking(self, result=None, error=None):
+        def function():
+            self.calls.append(1)
+            self.started.set()
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+        return function
+
+    def run_concurrently(self, function, count):
+        results = []
+        errors = []
+
+        def target():
+            try:
+                results.append(function())
+            except Exception as error:
+                errors.append(error)
+
+        leader = Thread(target=target)
+        leader.start()
+        self.started.wait(5)
+
+        threads = [Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+
+        self.wait_for_waiters()
+        self.release.set()
+
+        for thread in [leader] + threads:
+            thread.join(5)
+
+        return results, errors
+
+    def wait_for_waiters(self):
+        call = self.flight._calls[self.KEY]
+        deadline = time.time() + 5
+        while call.waiters < self.WAITERS and time.time() < deadline:
+            time.sleep(0.001)
+
+
+class SingleFlightTestCase(BaseSingleFlightTestCase):
+
+    KEY = 'key'
+
+    def setUp(self):
+        super(SingleFlightTestCase, self).setUp()
+        self.flight = SingleFlight()
+
+    def test_returns_function_result(self):
+        self.assertEqual(self.flight.do('key', lambda: 'result'), 'result')
+
+    def test_runs_function_once_for_concurrent_calls(self):
+        function = self.blocking(result='result')
+        results, errors = self.run_concurrently(
+            lambda: self.flight.do('key', function), self.WAITERS)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, ['result'] * (self.WAITERS + 1))
+        self.assertEqual(errors, [])
+
+    def test_raises_error_on_every_caller(self):
+        error = ValueError('boom')
+        function = self.blocking(error=error)
+        results, errors = self.run_concurrently(
+            lambda: self.flight.do('key', function), self.WAITERS)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [])
+        self.assertEqual(errors, [error] * (self.WAITERS + 1))
+
+    def test_releases_key_after_call(self):
+        self.flight.do('key', lambda: None)
+        self.assertNotIn('key', self.flight)
+
+        with self.assertRaises(ValueError):
+            self.flight.do('key', Mock(side_effect=ValueError))
+        self.assertEqual(len(self.flight), 0)
+
+    def test_runs_different_keys_independently(self):
+        self.assertEqual(self.flight.do('a', lambda: 'a'), 'a')
+        self.assertEqual(self.flight.do('b', lambda: 'b'), 'b')
+
+
+class ConcurrentLazySchemaTestCase(BaseSingleFlightTestCase):
+
+    KEY = URL = 'http://example.com/schema'
+
+    def setUp(self):
+        super(ConcurrentLazySchemaTestCase, self).setUp()
+        self.session = Session()
+        self.flight = self.session.schema_fetches
+
+        response = Mock(status_code=200, headers={})
+        response.json.return_value = {'title': 'schema'}
+
+        self.session.request = Mock(
+            side_effect=lambda url: self.blocking(response)())
+
+    def test_fetches_schema_once_for_concurrent_readers(self):
+        schema = LazySchema(self.URL, session=self.session)
+        results, errors = self.run_concurrently(
+            lambda: schema.raw_schema['title'], self.WAITERS)
+
+        self.session.request.assert_called_once_with(self.URL)
+        self.assertEqual(results, ['schema'] * (self.WAITERS + 1))
+
+    def test_shares_fetch_between_schemas_of_same_url(self):
+        schemas = [
+            LazySchema(self.URL + '#/properties/%d' % i, session=self.session)
+            for i in range(self.WAITERS + 1)]
+        readers = iter(schemas)
+        results, errors = self.run_concurrently(
+            lambda: next(readers).raw_schema['title'], self.WAITERS)
+
+        self.session.request.assert_called_once_with(self.URL)
+        self.assertEqual(results, ['schema'] * (self.WAITERS + 1))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from pluct.store import SchemaStore
+from pluct.tests.mocks import Clock
+
+
+class SchemaStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.store = SchemaStore()
+
+    def test_behaves_as_mapping(self):
+        self.store['/a#'] = 'a'
+        self.assertIn('/a#', self.store)
+        self.assertEqual(self.store['/a#'], 'a')
+        self.assertEqual(list(self.store), ['/a#'])
+        self.assertEqual(len(self.store), 1)
+
+        del self.store['/a#']
+        self.assertNotIn('/a#', self.store)
+
+    def test_get_returns_default_for_missing_href(self):
+        self.assertIs(self.store.get('/missing#'), None)
+
+    def test_counts_hits_and_misses(self):
+        self.store['/a#'] = 'a'
+        self.store.get('/a#')
+        self.store.get('/a#')
+        self.store.get('/b#')
+
+        self.assertEqual(self.store.stats(), {
+            'size': 1, 'hits': 2, 'misses': 1, 'evictions': 0})
+
+    def test_contains_does_not_count_lookups(self):
+        self.store['/a#'] = 'a'
+        self.assertIn('/a#', self.store)
+        self.assertNotIn('/b#', self.store)
+        self.assertEqual((self.store.hits, self.store.misses), (0, 0))
+
+
+class BoundedSchemaStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.store = SchemaStore(max_size=2)
+
+    def test_evicts_least_recently_used(self):
+        self.store['/a#'] = 'a'
+        self.store['/b#'] = 'b'
+        self.store.get('/a#')
+        self.store['/c#'] = 'c'
+
+        self.assertEqual(sorted(self.store), ['/a#', '/c#'])
+        self.assertEqual(self.store.evictions, 1)
+
+    def test_pins_root_while_pointers_are_stored(self):
+        self.store['/a#'] = 'a'
+        self.store['/b#'] = 'b'
+        self.store['/a#/items'] = 'items'
+
+        self.assertTrue(self.store.is_pinned('/a#'))
+        self.assertEqual(sorted(self.store), ['/a#', '/a#/items'])
+
+    def test_unpins_root_when_pointers_are_evicted(self):
+        self.store['/a#'] = 'a'
+        self.store['/a#/items'] = 'items'
+        self.store['/b#'] = 'b'
+        self.store['/c#'] = 'c'
+
+        self.assertFalse(self.store.is_pinned('/a#'))
+        self.assertEqual(sorted(self.store), ['/b#', '/c#'])
+
+    def test_replacing_pointer_does_not_pin_root_twice(self):
+        self.store['/a#/items'] = 'items'
+        self.store['/a#/items'] = 'other items'
+        del self.store['/a#/items']
+        self.assertFalse(self.store.is_pinned('/a#'))
+
+
+class ExpiringSchemaStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock(now=0)
+        self.store = SchemaStore(ttl=10, clock=self.clock)
+
+    def test_expires_entries_after_ttl(self):
+        self.store['/a#'] = 'a'
+        self.clock.now = 10
+
+        self.assertIs(self.store.get('/a#'), None)
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.evictions, 1)
+
+    def test_keeps_pinned_roots_after_ttl(self):
+        self.store['/a#'] = 'a'
+        self.clock.now = 5
+        self.store['/a#/items'] = 'items'
+        self.clock.now = 10
+
+        self.assertEqual(self.store.get('/a#'), 'a')
+
+    def test_purges_expired_entries_on_write(self):
+        self.store['/a#'] = 'a'
+        self.store['/a#/items'] = 'items'
+        self.clock.now = 10
+        self.store['/b#'] = 'b'
+
+        self.assertNotIn('/a#/items', self.store)
+        self.assertIn('/b#', self.store)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+from pluct.streaming import iter_json_array
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJSONArrayTestCase(TestCase):
+
+    def setUp(self):
+        self.items = [
+            {'id': 1, 'name': u'caf\xe9', 'tags': ['a', 'b']},
+            {'id': 22, 'nested': {'list': [1, 2.5, None, True]}},
+            12345,
+            'text, with ] and , inside',
+            [],
+        ]
+        self.text = json.dumps(self.items, indent=2)
+
+    def test_parses_top_level_array(self):
+        items = list(iter_json_array([self.text]))
+        self.assertEqual(items, self.items)
+
+    def test_parses_any_chunk_size(self):
+        for size in (1, 2, 3, 7, 64):
+            items = list(iter_json_array(chunked(self.text, size)))
+            self.assertEqual(items, self.items)
+
+    def test_does_not_split_numbers_between_chunks(self):
+        self.assertEqual(
+            list(iter_json_array(['[12', '34, 5', '6.', '5]'])),
+            [1234, 56.5])
+
+    def test_parses_empty_array(self):
+        self.assertEqual(list(iter_json_array(['[', ' ]'])), [])
+
+    def test_parses_array_member(self):
+        text = json.dumps({
+            'count': 5,
+            'meta': {'items': 'not this one'},
+            'items': self.items,
+            'next': '/page/2',
+        })
+        items = list(iter_json_array(chunked(text, 5), member='items'))
+        self.assertEqual(items, self.items)
+
+    def test_missing_member_yields_nothing(self):
+        text = json.dumps({'count': 0, 'results': [1]})
+        self.assertEqual(list(iter_json_array([text], member='items')), [])
+
+    def test_yields_items_before_reading_all_chunks(self):
+        read = []
+
+        def chunks():
+            for chunk in chunked(self.text, 4):
+                read.append(chunk)
+                yield chunk
+
+        items = iter_json_array(chunks())
+        next(items)
+        self.assertLess(len(read), len(chunked(self.text, 4)))
+
+    def test_buffers_only_current_item(self):
+        item = {'id': 1, 'name': 'x' * 100}
+        text = json.dumps([item] * 1000)
+
+        items = iter_json_array(chunked(text, 8))
+        buffered = 0
+        for _ in items:
+            reader = items.gi_frame.f_locals['reader']
+            buffered = max(buffered, len(reader.buffer))
+
+        self.assertLess(buffered, 4 * len(json.dumps(item)))
+
+    def test_raises_for_invalid_json(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['[1, 2 3]']))
+
+    def test_raises_for_truncated_json(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['[{"id": 1}, {"id"']))
+
+    def test_raises_when_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['{"id": 1}']))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+import uritemplate
+
+from pluct.datastructures import ChainMap
+from pluct.uri import compile_template, URITemplate
+
+
+VARIABLES = {
+    'id': '123',
+    'slug': 'some slug',
+    'list': ['red', 'green', 'blue'],
+    'keys': {'semi': ';', 'dot': '.', 'comma': ','},
+    'path': '/foo/bar',
+    'empty': '',
+    'none': None,
+}
+
+TEMPLATES = [
+    '',
+    '/api/items',
+    '/api/items/{id}',
+    '/api/{id}/{slug}/',
+    '{+path}/here',
+    '{#path}',
+    'X{.list}',
+    'X{.list*}',
+    '{/list*,path:4}',
+    '{;keys*}',
+    '/search{?slug,id,missing}',
+    '/search{?list*}{&keys}',
+    '{slug:3}',
+    '{empty}{none}',
+    '{missing=default}',
+    '{empty=default}/{none=default}',
+]
+
+
+class URITemplateTestCase(TestCase):
+
+    def test_expands_as_uritemplate(self):
+        for href in TEMPLATES:
+            self.assertEqual(
+                URITemplate(href).expand(VARIABLES),
+                uritemplate.expand(href, VARIABLES), href)
+
+    def test_has_uritemplate_variables(self):
+        for href in TEMPLATES:
+            self.assertEqual(
+                URITemplate(href).variables, uritemplate.variables(href))
+
+    def test_expands_layered_variables(self):
+        template = URITemplate('/api/{id}/{slug}')
+        variables = ChainMap({'slug': 'param'}, {'id': 1, 'slug': 'data'})
+        self.assertEqual(template.expand(variables), '/api/1/param')
+
+    def test_invalid_prefix_fails_on_expand(self):
+        template = URITemplate('/api/{id:x}')
+        with self.assertRaises(ValueError):
+            template.expand({'id': 1})
+
+
+class CompileTemplateTestCase(TestCase):
+
+    def test_caches_compiled_templates(self):
+        template = compile_template('/api/{id}')
+        self.assertIsInstance(template, URITemplate)
+        self.assertIs(compile_template('/api/{id}'), template)
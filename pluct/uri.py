@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+
+import uritemplate
+from uritemplate import OPERATOR, RESERVED, TEMPLATE, TOSTRING
+
+MAX_TEMPLATES = 4096
+
+_templates = {}
+_lock = Lock()
+
+
+def compile_template(href):
+    template = _templates.get(href)
+    if template is None:
+        template = URITemplate(href)
+        with _lock:
+            if len(_templates) >= MAX_TEMPLATES:
+                _templates.clear()
+            _templates[href] = template
+    return template
+
+
+class URITemplate(object):
+
+    def __init__(self, template):
+        self.template = template
+        self.variables = uritemplate.variables(template)
+        self.parts = []
+
+        position = 0
+        for match in TEMPLATE.finditer(template):
+            if match.start() > position:
+                self.parts.append(template[position:match.start()])
+            self.parts.append(Expression(match.group(1)))
+            position = match.end()
+
+        if position < len(template):
+            self.parts.append(template[position:])
+
+    def expand(self, variables):
+        return ''.join([
+            part.expand(variables) if isinstance(part, Expression) else part
+            for part in self.parts])
+
+    def __repr__(self):
+        return '<URITemplate %s>' % self.template
+
+
+class Expression(object):
+
+    def __init__(self, expression):
+        self.operator = ''
+        varlist = expression
+        if expression[0] in OPERATOR:
+            self.operator = expression[0]
+            varlist = expression[1:]
+
+        self.safe = RESERVED if self.operator in ('+', '#') else ''
+        self.tostring = TOSTRING[self.operator]
+
+        self.start = self.operator
+        self.joiner = self.operator
+        if self.operator == '+':
+            self.start = ''
+            self.joiner = ','
+        elif self.operator in ('#', ''):
+            self.joiner = ','
+        elif self.operator == '?':
+            self.joiner = '&'
+        elif self.operator == '&':
+            self.start = '&'
+
+        self.varspecs = []
+        self.defaults = {}
+        self.error = None
+        try:
+            for varspec in varlist.split(','):
+                self.varspecs.append(self._parse_varspec(varspec))
+        except (IndexError, ValueError) as error:
+            # Invalid expressions only fail when expanded, as in uritemplate
+            self.error = error
+
+    def _parse_varspec(self, varspec):
+        default = None
+        explode = False
+        prefix = None
+
+        if '=' in varspec:
+            varname, default = varspec.split('=', 1)
+        else:
+            varname = varspec
+
+        if varname[-1] == '*':
+            explode = True
+            varname = varname[:-1]
+        elif ':' in varname:
+            varname, prefix = varname.split(':', 1)
+            try:
+                prefix = int(prefix)
+            except ValueError:
+                raise ValueError("non-integer prefix '{0}'".format(prefix))
+
+        if default:
+            self.defaults[varname] = default
+
+        return varname, explode, prefix
+
+    def expand(self, variables):
+        if self.error is not None:
+            raise self.error
+
+        expanded = []
+        for varname, explode, prefix in self.varspecs:
+            if varname in variables:
+                value = variables[varname]
+                if not value and value != '' and varname in self.defaults:
+                    value = self.defaults[varname]
+            elif varname in self.defaults:
+                value = self.defaults[varname]
+            else:
+                continue
+
+            value = self.tostring(
+                varname, value, explode, prefix, self.operator,
+                safe=self.safe)
+            if value is not None:
+                expanded.append(value)
+
+        if not expanded:
+            return ''
+        return self.start + self.joiner.join(expanded)
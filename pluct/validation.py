@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import re
+from collections import namedtuple
+
+from jsonpointer import JsonPointer
+from jsonschema import Draft3Validator, RefResolver
+from jsonschema.validators import validator_for
+
+# Keywords that do not take part on the validation
+ANNOTATIONS = frozenset([
+    '$schema', 'id', '$id', '$comment', 'title', 'description', 'default',
+    'examples', 'definitions', '$defs', 'readOnly', 'writeOnly',
+    'deprecated', 'links', 'media', 'pathStart', 'fragmentResolution',
+])
+
+# Keywords that only look at the container itself, never into its values
+CONTAINER_KEYWORDS = {
+    'object': frozenset([
+        'type', 'required', 'minProperties', 'maxProperties',
+        'propertyNames', 'dependentRequired',
+    ]),
+    'array': frozenset(['type', 'minItems', 'maxItems']),
+}
+
+# Keywords that look at each value on its own
+VALUE_KEYWORDS = {
+    'object': frozenset([
+        'properties', 'patternProperties', 'additionalProperties']),
+    'array': frozenset(['items']),
+}
+
+ValidationResult = namedtuple('ValidationResult', 'valid errors')
+
+ValidationIssue = namedtuple('ValidationIssue', 'path message')
+
+# Validators compiled on each worker process of a bulk validation
+_worker_validators = {}
+
+
+def sub_validator(validator, schema):
+    # Keeps the resolver, so references are resolved against the root
+    evolve = getattr(validator, 'evolve', None)
+    if evolve is not None:
+        return evolve(schema=schema)
+    return validator.__class__(schema, resolver=validator.resolver)
+
+
+def split_schema(validator, kind):
+    # Splits the schema in the keywords checked on the container and on
+    # its values. Schemas with keywords that need the whole container,
+    # like allOf or uniqueItems, can not be split.
+    schema = validator.schema
+    if not isinstance(schema, dict) or isinstance(validator, Draft3Validator):
+        return None
+    if kind == 'array' and isinstance(schema.get('items'), list):
+        return None
+
+    container = {}
+    for keyword, value in schema.items():
+        if keyword in CONTAINER_KEYWORDS[kind]:
+            container[keyword] = value
+        elif (keyword not in VALUE_KEYWORDS[kind] and
+                keyword not in ANNOTATIONS):
+            return None
+    return container
+
+
+def value_schemas(schema, kind, key):
+    if kind == 'array':
+        return [schema['items']] if 'items' in schema else []
+
+    schemas = []
+    properties = schema.get('properties', {})
+    if key in properties:
+        schemas.append(properties[key])
+    for pattern, value in schema.get('patternProperties', {}).items():
+        if re.search(pattern, key):
+            schemas.append(value)
+    if not schemas and 'additionalProperties' in schema:
+        schemas.append(schema['additionalProperties'])
+    return schemas
+
+
+def validate_item(validator, item):
+    errors = [
+        ValidationIssue(error_path(error), error.message)
+        for error in validator.iter_errors(item)]
+    return ValidationResult(not errors, errors)
+
+
+def error_path(error):
+    parts = [str(part) for part in error.absolute_path]
+    return JsonPointer.from_parts(parts).path
+
+
+def validate_chunk(task):
+    # Runs on worker processes, where schemas of other documents come from
+    # the store sent along, as the session can not be shared
+    key, raw_schema, raw_node, store, items = task
+    validator = _worker_validators.get(key)
+    if validator is None:
+        resolver = RefResolver.from_schema(raw_schema, store=store)
+        validator = validator_for(raw_schema)(raw_schema, resolver=resolver)
+        if raw_node is not None:
+            validator = sub_validator(validator, raw_node)
+        _worker_validators[key] = validator
+
+    return [validate_item(validator, item) for item in items]
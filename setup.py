@@ -21,12 +21,14 @@ setup(
         'Programming Language :: Python :: 3.6',
     ],
     test_suite='pluct.tests',
-    packages=find_packages(exclude=('pluct.tests.*', 'pluct.tests')),
+    packages=find_packages(exclude=('pluct.tests.*', 'pluct.tests',
+                                    'benchmarks', 'benchmarks.*')),
     include_package_data=True,
     install_requires=[
         'requests',
         'uritemplate>=0.6,<1.0',
         'jsonschema',
         'jsonpointer',
+        'futures; python_version < "3.0"',
     ],
 )